@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Buses America - Inventory Listing Serialization Benchmark
+Measures the per-row cost of GET /api/inventory response serialization for the
+full Inventory model versus the slim projections (fields=summary / fields=a,b,c).
+
+The endpoint runs for real through FastAPI's TestClient; only get_db is swapped
+for an in-memory connection that returns pre-built rows, so no database is
+needed and the numbers isolate serialization work.
+
+Usage:
+    python benchmarks/bench_inventory_serialization.py [--rows 1000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import backend_api_FINAL as api  # noqa: E402
+
+# Every inventory column with the Python type asyncpg hands back for it
+INVENTORY_COLUMNS = [
+    ("inventory_id", "int"), ("stock_number", "str"), ("vin", "str"), ("year", "int"),
+    ("make", "str"), ("model", "str"), ("body_style", "str"), ("bus_type", "str"),
+    ("passenger_capacity", "int"), ("wheelchair_capacity", "int"), ("engine_make", "str"),
+    ("engine_model", "str"), ("engine_type", "str"), ("transmission", "str"),
+    ("fuel_type", "str"), ("gvwr", "int"), ("length_feet", "dec"), ("odometer", "int"),
+    ("odometer_unit", "str"), ("condition", "str"), ("exterior_color", "str"),
+    ("interior_color", "str"), ("title_status", "str"), ("supplier_id", "int"),
+    ("purchase_date", "date"), ("purchase_price_usd", "dec"), ("purchase_location", "str"),
+    ("purchase_invoice_number", "str"), ("transport_to_stock_cost_usd", "dec"),
+    ("transport_to_stock_notes", "text"), ("initial_reconditioning_cost_usd", "dec"),
+    ("other_acquisition_costs_usd", "dec"), ("cost_in_us_stock_usd", "dec"),
+    ("asking_price", "dec"), ("asking_currency", "str"), ("minimum_price", "dec"),
+    ("minimum_currency", "str"), ("status", "str"), ("current_location", "str"),
+    ("us_stock_location", "str"), ("mexico_stock_location", "str"), ("is_sold", "bool"),
+    ("sale_date", "date"), ("client_name", "str"), ("client_company", "str"),
+    ("client_location", "str"), ("client_contact", "str"), ("client_email", "str"),
+    ("client_phone", "str"), ("client_use_case", "text"), ("sale_price", "dec"),
+    ("sale_currency", "str"), ("sale_price_usd", "dec"), ("sale_price_mxn", "dec"),
+    ("deposit_amount", "dec"), ("deposit_currency", "str"), ("deposit_date", "date"),
+    ("balance_due", "dec"), ("balance_currency", "str"), ("payment_status", "str"),
+    ("final_payment_date", "date"), ("preventive_maintenance_cost", "dec"),
+    ("preventive_maintenance_currency", "str"), ("preventive_maintenance_notes", "text"),
+    ("preventive_maintenance_date", "date"), ("border_crossing", "str"),
+    ("import_started_date", "date"), ("import_completed_date", "date"),
+    ("customs_broker", "str"), ("import_cost_mxn", "dec"), ("customs_cost_mxn", "dec"),
+    ("regulatory_cost_mxn", "dec"), ("other_import_costs_mxn", "dec"),
+    ("import_documents_complete", "bool"), ("import_notes", "text"),
+    ("transport_to_client_cost_mxn", "dec"), ("transport_to_client_notes", "text"),
+    ("other_costs_after_sale", "dec"), ("other_costs_currency", "str"),
+    ("exchange_rate_used", "dec"), ("total_cost_usd", "dec"), ("total_cost_mxn", "dec"),
+    ("profit_usd", "dec"), ("profit_mxn", "dec"), ("delivery_date", "date"),
+    ("delivery_method", "str"), ("delivery_notes", "text"), ("warranty_start_date", "date"),
+    ("warranty_end_date", "date"), ("warranty_status", "str"), ("days_in_inventory", "int"),
+    ("days_in_us_stock", "int"), ("days_in_mexico_stock", "int"), ("days_in_warranty", "int"),
+    ("features", "list"), ("description", "text"), ("internal_notes", "text"),
+    ("pre_inspection_id", "int"), ("created_by", "str"), ("created_at", "ts"),
+    ("updated_at", "ts"), ("is_deleted", "bool"),
+
+]
+
+def make_inventory_row(i: int) -> dict:
+    """A fully populated inventory row, typed as asyncpg would return it"""
+    base = datetime(2024, 1, 1) + timedelta(minutes=i)
+    row = {}
+    for column, kind in INVENTORY_COLUMNS:
+        if kind == "int":
+            row[column] = i
+        elif kind == "str":
+            row[column] = f"{column}-{i % 97}"
+        elif kind == "text":
+            row[column] = f"{column} notes for unit {i} " * 4
+        elif kind == "dec":
+            row[column] = Decimal("12345.67") + i
+        elif kind == "date":
+            row[column] = base.date()
+        elif kind == "ts":
+            row[column] = base
+        elif kind == "bool":
+            row[column] = bool(i % 2)
+        elif kind == "list":
+            row[column] = ["Air Conditioning", "Wheelchair Lift", "Camera System"]
+    row["year"] = 2015 + i % 8
+    return row
+
+class FakeConnection:
+    """Answers get_inventory's fetch() with canned rows, honouring the SELECT list"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch(self, query, *params):
+        select_list = re.search(r"SELECT (.*?) FROM inventory\s", query, re.S).group(1).strip()
+        limit = params[-2] if "OFFSET" in query else params[-1]
+        rows = self.rows[:limit]
+        with_thumbnail = api.PRIMARY_THUMBNAIL_SQL in select_list
+        select_list = select_list.replace(", " + api.PRIMARY_THUMBNAIL_SQL, "")
+        # Every selected column or derived expression ends in its quoted name
+        columns = re.findall(r'"(\w+)"', select_list)
+        projected = [{c: row[c] for c in columns} for row in rows]
+        if with_thumbnail:
+            for row in projected:
+                row["primary_thumbnail"] = f"/api/photos/{row['inventory_id']}?variant=thumbnail"
+        return projected
+
+    async def prepare(self, query):
+        class Statement:
+            def get_attributes(self):
+                return [type("Attr", (), {"name": c})() for c, _ in INVENTORY_COLUMNS]
+        return Statement()
+
+MODES = {
+    "full (Inventory)": {},
+    "fields=summary": {"fields": "summary"},
+    "fields=vin,make,model,year,status": {"fields": "vin,make,model,year,status"},
+}
+
+def time_request(client, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/api/inventory", params=params)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row serialization cost of GET /api/inventory")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per measurement")
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args()
+
+    rows = [make_inventory_row(i) for i in range(args.rows)]
+    connection = FakeConnection(rows)
+
+    async def fake_db():
+        yield connection
+
+    api.app.dependency_overrides[api.get_db] = fake_db
+    client = TestClient(api.app)
+
+    print("=" * 70)
+    print(f"GET /api/inventory serialization, {args.rows} rows/page, median of {args.repeat}")
+    print("=" * 70)
+    print(f"{'mode':<36} {'page ms':>10} {'bytes':>10} {'us/row':>10}")
+
+    results = {}
+    for name, extra in MODES.items():
+        client.get("/api/inventory", params={"limit": args.rows, **extra})  # warm up
+        empty = time_request(client, {"limit": 0, **extra}, args.repeat)
+        page = time_request(client, {"limit": args.rows, **extra}, args.repeat)
+        size = len(client.get("/api/inventory", params={"limit": args.rows, **extra}).content)
+        per_row_us = (page - empty) / args.rows * 1e6
+        results[name] = {"page_ms": page * 1e3, "bytes": size, "per_row_us": per_row_us}
+        print(f"{name:<36} {page * 1e3:>10.1f} {size:>10} {per_row_us:>10.1f}")
+
+    baseline = results["full (Inventory)"]["per_row_us"]
+    print()
+    for name, result in list(results.items())[1:]:
+        print(f"  {name:<36} {baseline / result['per_row_us']:.1f}x faster per row than full")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"rows": args.rows, "repeat": args.repeat, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Buses America - JSON Response Benchmark
+Times the row-list endpoints with FAST_JSON_RESPONSES off (response_model
+validation + FastAPI's encoder, as before) and on (rows encoded by orjson
+through FastJSONResponse), and checks both produce the same JSON.
+
+Requests run for real through FastAPI's TestClient; db_pool is replaced by an
+in-memory pool whose connections answer with pre-built rows typed the way
+asyncpg returns them, so no database is needed and the numbers isolate
+validation and encoding.
+
+Usage:
+    python benchmarks/bench_json_responses.py [--rows 1000] [--repeat 20] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import typing
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import backend_api_FINAL as api  # noqa: E402
+from bench_inventory_serialization import make_inventory_row  # noqa: E402
+
+# Table read by each endpoint -> response model its rows are shaped by
+TABLE_MODELS = {
+    "exchange_rates": api.ExchangeRate,
+    "suppliers": api.Supplier,
+    "pre_purchase_inspections": api.PrePurchaseInspection,
+    "work_plans": api.WorkPlan,
+    "warranty_claims": api.WarrantyClaim,
+}
+
+ENDPOINTS = [
+    ("GET /api/inventory", "/api/inventory", {"limit": "{rows}"}),
+    ("GET /api/inventory?pagination=cursor", "/api/inventory", {"limit": "{rows}", "pagination": "cursor"}),
+    ("GET /api/inspections/pre-purchase", "/api/inspections/pre-purchase", {"limit": "{rows}"}),
+    ("GET /api/exchange-rates", "/api/exchange-rates", {"limit": "{rows}"}),
+    ("GET /api/suppliers", "/api/suppliers", {}),
+    ("GET /api/inventory/{id}/work-plans", "/api/inventory/1/work-plans", {}),
+    ("GET /api/reports/us-inventory", "/api/reports/us-inventory", {}),
+    ("GET /api/reports/us-inventory?format=ndjson", "/api/reports/us-inventory", {"format": "ndjson"}),
+]
+
+def sample_value(annotation, name, i):
+    """A value of the Python type asyncpg returns for a column of this annotation"""
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if args and typing.get_origin(annotation) is typing.Union:
+        return sample_value(args[0], name, i)
+    if typing.get_origin(annotation) is list:
+        return ["Air Conditioning", "Wheelchair Lift"]
+    base = datetime(2024, 1, 1) + timedelta(minutes=i)
+    if annotation is bool:
+        return bool(i % 2)
+    if annotation is int:
+        return i
+    if annotation is Decimal:
+        return Decimal("1234.56") + i
+    if annotation is datetime:
+        return base
+    if annotation is date:
+        return base.date()
+    return f"{name}-{i % 97}"
+
+def make_model_row(model, i):
+    return {name: sample_value(field.annotation, name, i) for name, field in model.model_fields.items()}
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def __aiter__(self):
+        for row in self.rows:
+            yield row
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeConnection:
+    """Answers fetch()/cursor() with canned rows, honouring the SELECT list and LIMIT"""
+
+    def __init__(self, rows):
+        self.inventory = [make_inventory_row(i) for i in range(rows)]
+        self.tables = {table: [make_model_row(model, i) for i in range(rows)] for table, model in TABLE_MODELS.items()}
+
+    def rows_for(self, query, params):
+        select_list, table = re.search(r"SELECT (.*?) FROM (\w+)", query, re.S).groups()
+        rows = self.tables.get(table, self.inventory)
+        if "LIMIT" in query:
+            rows = rows[:params[-2] if "OFFSET" in query else params[-1]]
+        if select_list.strip() == "*":
+            return rows
+        columns = re.findall(r'"(\w+)"', select_list)
+        return [{c: row[c] for c in columns} for row in rows]
+
+    async def fetch(self, query, *params):
+        return self.rows_for(query, params)
+
+    def cursor(self, query, *params, prefetch=None):
+        return FakeCursor(self.rows_for(query, params))
+
+    def transaction(self, **kwargs):
+        return FakeTransaction()
+
+    async def prepare(self, query):
+        class Statement:
+            def get_attributes(self):
+                return [type("Attr", (), {"name": name})() for name in make_inventory_row(0)]
+        return Statement()
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def acquire(self, timeout=None):
+        return self.connection
+
+    async def release(self, connection):
+        pass
+
+def time_request(client, url, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, params=params)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples)
+
+def parse_body(response):
+    if response.headers["content-type"].startswith("application/x-ndjson"):
+        return [json.loads(line) for line in response.text.splitlines()]
+    return response.json()
+
+def main():
+    parser = argparse.ArgumentParser(description="Row-list endpoint latency with and without FAST_JSON_RESPONSES")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per response")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per measurement")
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args()
+
+    api.db_pool = FakePool(FakeConnection(args.rows))
+    client = TestClient(api.app)
+
+    print("=" * 86)
+    print(f"Row-list endpoints, {args.rows} rows, median of {args.repeat} requests")
+    print("=" * 86)
+    print(f"{'endpoint':<46} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'same':>6}")
+
+    results = {}
+    for name, url, params in ENDPOINTS:
+        params = {k: v.format(rows=args.rows) for k, v in params.items()}
+        timings, bodies = {}, {}
+        for fast in (False, True):
+            api.FAST_JSON_RESPONSES = fast
+            bodies[fast] = parse_body(client.get(url, params=params))  # also warms up
+            timings[fast] = time_request(client, url, params, args.repeat)
+        same = bodies[False] == bodies[True]
+        results[name] = {
+            "before_ms": timings[False] * 1e3,
+            "after_ms": timings[True] * 1e3,
+            "speedup": timings[False] / timings[True],
+            "same_json": same,
+        }
+        print(f"{name:<46} {timings[False] * 1e3:>10.1f} {timings[True] * 1e3:>10.1f} "
+              f"{timings[False] / timings[True]:>7.1f}x {'yes' if same else 'NO':>6}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"rows": args.rows, "repeat": args.repeat, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Buses America - Worker Scaling Benchmark
+Starts the production server (gunicorn -c gunicorn.conf.py) with 1, 2, 4...
+uvicorn workers against the load test schema and measures throughput of a few
+CPU-bound read endpoints at each worker count, reusing the load test's fleet,
+request builders and burst runner.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_workers.py
+        [--workers 1,2,4] [--concurrency 32] [--requests 400] [--only inventory]
+
+Seeds the load_test schema first if it does not exist (see load_test.py).
+Throughput can only scale up to the number of free cores, and the load
+generator runs in this process and needs a core of its own; compare runs made
+on the same machine.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load_test  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Endpoints whose cost is mostly Python (serialization), where workers help most
+DEFAULT_SCENARIOS = [
+    "GET /api/inventory",
+    "GET /api/inventory/{id}",
+    "GET /api/inspections/pre-purchase",
+]
+
+def start_server(database_url, workers, port, upload_dir):
+    env = {
+        **os.environ,
+        "DATABASE_URL": load_test.with_search_path(database_url),
+        "UPLOAD_DIR": upload_dir,
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_ACCESS_LOG": "",
+    }
+    return subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py", "backend_api_FINAL:app"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+
+async def wait_until_ready(client, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited:\n{server.stderr.read().decode()}")
+        try:
+            if (await client.get("/api/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("gunicorn did not become healthy in time")
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+async def bench(args, database_url, workers, scenarios):
+    rng = random.Random(args.seed)
+    ctx = await load_test.load_fixtures(database_url, rng)
+    server = start_server(database_url, workers, args.port, args.upload_dir)
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as client:
+            await wait_until_ready(client, server)
+            for index, (name, builder, _) in enumerate(scenarios):
+                # Warm every worker's pool and caches before measuring
+                await load_test.run_scenario(
+                    client, name, builder, ctx, args.warmup, args.concurrency, args.seed + 1000 + index
+                )
+                results[name] = await load_test.run_scenario(
+                    client, name, builder, ctx, args.requests, args.concurrency, args.seed + index
+                )
+    finally:
+        stop_server(server)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the gunicorn server by worker count")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=64, help="unmeasured requests per endpoint")
+    parser.add_argument("--only", action="append", help="endpoints containing this text (repeatable)")
+    parser.add_argument("--rows", type=int, default=100_000, help="inventory rows if seeding is needed")
+    parser.add_argument("--schema-file", default=os.path.join(REPO_ROOT, "bus_inventory_schema_FINAL.sql"))
+    parser.add_argument("--upload-dir", default=os.path.join(load_test.tempfile.gettempdir(), "ba_load_test_uploads"))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    if args.only:
+        scenarios = [s for s in load_test.SCENARIOS if not s[2] and any(o in s[0] for o in args.only)]
+    else:
+        scenarios = [s for s in load_test.SCENARIOS if s[0] in DEFAULT_SCENARIOS]
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    print("=" * 50)
+    print("Buses America - Worker Scaling Benchmark")
+    print("=" * 50)
+    print(f"{os.cpu_count()} CPU(s), concurrency {args.concurrency}, {args.requests} requests per endpoint")
+
+    asyncio.run(load_test.seed(database_url, args.schema_file, args.rows, args.upload_dir, reuse=True))
+
+    by_workers = {}
+    for workers in worker_counts:
+        print(f"\n▶ {workers} worker(s)")
+        by_workers[workers] = asyncio.run(bench(args, database_url, workers, scenarios))
+
+    baseline = by_workers[worker_counts[0]]
+    print(f"\n{'endpoint':<40} {'workers':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'speedup':>8} {'err':>5}")
+    for name, _, _ in scenarios:
+        for workers in worker_counts:
+            result = by_workers[workers][name]
+            speedup = result["throughput_rps"] / baseline[name]["throughput_rps"]
+            print(f"{name:<40} {workers:>7} {result['throughput_rps']:>8.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {speedup:>7.2f}x {result['errors']:>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+"""
+Buses America - API Load Test
+Seeds a synthetic fleet (inventory, inspections, work plans, photos, warranty
+claims) into a scratch Postgres schema, then drives every endpoint of
+backend_api_FINAL.py with concurrent clients and reports p50/p95/p99 latency,
+throughput and DB time per endpoint.
+
+By default the app runs in-process behind httpx's ASGI transport, so nothing
+touches the network. With --url the requests go to an already running server
+instead (start it with DATABASE_URL=...?search_path=load_test). Either way DB
+time and query counts come from the app's /metrics counters, diffed around each
+burst (with several server workers they cover only the one that answered).
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/load_test.py [--rows 100000]
+        [--concurrency 16] [--requests 200] [--only inventory] [--json run.json]
+    DATABASE_URL=postgresql://... python benchmarks/load_test.py --seed-only
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --reuse
+    python benchmarks/load_test.py --compare before.json after.json
+
+Each endpoint gets its own burst of --requests requests so the numbers are not
+mixed across endpoints. Write endpoints run last. They only touch rows the load
+test created, so the read numbers of a --reuse run stay comparable.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import asyncpg
+import httpx
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import photo_processing  # noqa: E402
+
+LOAD_SCHEMA = "load_test"
+PHOTO_IMAGES = 4
+
+SEED_SQL = """
+INSERT INTO suppliers (company_name, contact_person, email, city, state, supplier_type, payment_terms)
+SELECT
+    'Supplier ' || g,
+    'Contact ' || g,
+    'supplier' || g || '@example.com',
+    (ARRAY['Dallas', 'Houston', 'Phoenix', 'Fort Worth', 'San Antonio'])[1 + g % 5],
+    (ARRAY['TX', 'TX', 'AZ', 'TX', 'TX'])[1 + g % 5],
+    (ARRAY['Auction', 'Trade-in', 'Dealer', 'Private'])[1 + g % 4],
+    'Net 15'
+FROM generate_series(1, 200) g;
+
+INSERT INTO exchange_rates (rate, effective_date, created_by)
+SELECT 17 + (g % 100) / 100.0, CURRENT_DATE - g + 1, 'load_test'
+FROM generate_series(1, 2000) g;
+
+-- One approved inspection per unit, plus one rejected for every five approved
+INSERT INTO pre_purchase_inspections (
+    vin, stock_number_temp, year, make, model, odometer, inspection_date,
+    inspector_name, engine_condition, transmission_condition, overall_rating,
+    recommendation, decision, decision_date
+)
+SELECT
+    'LT' || lpad(g::text, 15, '0'),
+    'INSPECT-' || g,
+    2005 + g % 18,
+    (ARRAY['Blue Bird', 'Thomas Built', 'IC Bus', 'Freightliner', 'International'])[1 + g % 5],
+    'Model ' || g % 20,
+    40000 + g % 200000,
+    CURRENT_DATE - (g % 1800) - 7,
+    'Inspector ' || g % 12,
+    'Good',
+    'Good',
+    CASE WHEN g % 6 = 0 THEN 'Poor' ELSE 'Good' END,
+    CASE WHEN g % 6 = 0 THEN 'Reject' ELSE 'Approve for Purchase' END,
+    CASE WHEN g % 6 = 0 THEN 'Rejected' ELSE 'Approved' END,
+    CURRENT_DATE - (g % 1800) - 5
+FROM generate_series(1, $1::int * 6 / 5) g;
+
+-- Most of the fleet is delivered history, a few percent is live stock
+INSERT INTO inventory (
+    stock_number, vin, year, make, model, odometer, supplier_id, purchase_date,
+    purchase_price_usd, transport_to_stock_cost_usd, asking_price, status,
+    current_location, is_sold, sale_date, client_name, sale_price, sale_currency,
+    delivery_date, warranty_status, warranty_start_date, warranty_end_date,
+    features, pre_inspection_id, is_deleted, created_at
+)
+SELECT
+    'BA-' || lpad(g::text, 7, '0'),
+    vin, year, make, model, odometer,
+    1 + g % 200,
+    CURRENT_DATE - (g % 1800),
+    15000 + g % 40000,
+    800 + g % 1200,
+    30000 + g % 40000,
+    CASE
+        WHEN g % 100 < 3 THEN 'In Stock (US)'
+        WHEN g % 100 < 5 THEN 'In Stock (Mexico)'
+        WHEN g % 100 < 7 THEN 'Import/Customs Processing'
+        WHEN g % 100 = 7 THEN 'Purchased - In Transit to Stock'
+        ELSE 'Delivered'
+    END,
+    CASE
+        WHEN g % 100 < 3 THEN 'US Stock'
+        WHEN g % 100 < 5 THEN 'Mexico Stock'
+        WHEN g % 100 < 8 THEN 'In Transit'
+        ELSE 'Client'
+    END,
+    g % 100 >= 5 AND g % 100 != 7,
+    CASE WHEN g % 100 >= 5 AND g % 100 != 7 THEN CURRENT_DATE - (g % 1500) END,
+    CASE WHEN g % 100 >= 5 AND g % 100 != 7 THEN 'Client ' || g % 3000 END,
+    CASE WHEN g % 100 >= 5 AND g % 100 != 7 THEN 35000 + g % 40000 END,
+    CASE WHEN g % 100 >= 5 AND g % 100 != 7 THEN 'USD' END,
+    CASE WHEN g % 100 >= 8 THEN CURRENT_DATE - (g % 1400) END,
+    CASE WHEN g % 100 = 8 THEN 'Active' WHEN g % 100 > 8 THEN 'Expired' END,
+    CASE WHEN g % 100 >= 8 THEN CURRENT_DATE - (g % 1400) END,
+    CASE WHEN g % 100 = 8 THEN CURRENT_DATE + (g % 60) WHEN g % 100 > 8 THEN CURRENT_DATE - (g % 1400) END,
+    ARRAY['Air Conditioning', 'Camera System'],
+    inspection_id,
+    g % 50 = 49,
+    (CURRENT_DATE - (g % 1800))::timestamp + (g % 86400) * INTERVAL '1 second'
+FROM (
+    SELECT p.*, (row_number() OVER (ORDER BY inspection_id))::int AS g
+    FROM pre_purchase_inspections p
+    WHERE decision = 'Approved'
+) approved;
+
+UPDATE pre_purchase_inspections p
+SET inventory_id = i.inventory_id
+FROM inventory i
+WHERE i.pre_inspection_id = p.inspection_id;
+
+INSERT INTO work_plans (
+    inventory_id, plan_type, origin_location, destination_location, estimated_distance_km,
+    estimated_days, estimated_cost, cost_currency, completed, completion_date, actual_cost, created_date
+)
+SELECT
+    inventory_id, 'Acquisition', 'Auction lot ' || supplier_id, 'US Stock - Laredo',
+    300 + inventory_id % 1500, 2 + inventory_id % 5, 800 + inventory_id % 2000, 'USD',
+    status != 'Purchased - In Transit to Stock',
+    CASE WHEN status != 'Purchased - In Transit to Stock' THEN purchase_date + 4 END,
+    CASE WHEN status != 'Purchased - In Transit to Stock' THEN 850 + inventory_id % 2000 END,
+    purchase_date
+FROM inventory;
+
+INSERT INTO work_plans (
+    inventory_id, plan_type, origin_location, destination_location, estimated_distance_km,
+    estimated_days, estimated_cost, cost_currency, completed, completion_date, actual_cost, created_date
+)
+SELECT
+    inventory_id, 'Delivery', 'US Stock - Laredo', client_name,
+    400 + inventory_id % 2500, 3 + inventory_id % 6, 15000 + inventory_id % 20000, 'MXN',
+    delivery_date IS NOT NULL, delivery_date,
+    CASE WHEN delivery_date IS NOT NULL THEN 16000 + inventory_id % 20000 END,
+    sale_date
+FROM inventory
+WHERE is_sold = TRUE;
+
+INSERT INTO warranty_claims (inventory_id, claim_date, claim_type, description, client_name, status, cost)
+SELECT
+    inventory_id, warranty_start_date + 20,
+    (ARRAY['Engine', 'Transmission', 'Both'])[1 + inventory_id % 3],
+    'Synthetic claim for unit ' || stock_number,
+    client_name,
+    (ARRAY['Submitted', 'Under Review', 'Approved', 'Resolved'])[1 + inventory_id % 4],
+    500 + inventory_id % 3000
+FROM inventory
+WHERE warranty_start_date IS NOT NULL AND inventory_id % 20 = 0;
+
+-- Three in four units have 1-4 photos drawn from the seeded blobs
+INSERT INTO inventory_photos (
+    inventory_id, file_name, file_path, file_size, mime_type, content_hash,
+    web_path, thumbnail_path, width, height, photo_type, is_primary, display_order
+)
+SELECT
+    i.inventory_id, 'photo' || b.ord || '.jpg', b.path, b.size, 'image/jpeg', b.hash,
+    b.web, b.thumb, 1920, 1080, 'Exterior', b.ord = 1, b.ord
+FROM inventory i
+CROSS JOIN unnest($1::text[], $2::text[], $3::int[], $4::text[], $5::text[])
+    WITH ORDINALITY AS b(hash, path, size, web, thumb, ord)
+WHERE i.inventory_id % 4 != 3 AND b.ord <= 1 + i.inventory_id % 4;
+
+ANALYZE;
+"""
+
+# ---------------------------------------------------------------- seeding
+
+def seed_images(store_root):
+    """Put PHOTO_IMAGES distinct JPEGs (with variants) into the blob store"""
+    blobs = []
+    rng = random.Random(1)
+    for n in range(PHOTO_IMAGES):
+        img = Image.new("RGB", (1920, 1080), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        noise = Image.effect_noise((1920, 1080), 40).convert("RGB")
+        buf = io.BytesIO()
+        Image.blend(img, noise, 0.3).save(buf, "JPEG", quality=85)
+        buf.seek(0)
+        stored = photo_processing.store_upload(buf, store_root)
+        variants = photo_processing.variant_paths_for(store_root, stored["content_hash"])
+        photo_processing.make_variants(stored["path"], variants)
+        blobs.append({**stored, **variants})
+    return blobs
+
+async def seed(database_url, schema_file, rows, upload_dir, reuse):
+    conn = await asyncpg.connect(database_url)
+    try:
+        if reuse:
+            exists = await conn.fetchval(
+                "SELECT to_regclass($1) IS NOT NULL", f"{LOAD_SCHEMA}.inventory"
+            )
+            if exists:
+                count = await conn.fetchval(f"SELECT COUNT(*) FROM {LOAD_SCHEMA}.inventory")
+                print(f"Reusing {LOAD_SCHEMA} schema ({count:,} inventory rows)")
+                return
+
+        await conn.execute(f"DROP SCHEMA IF EXISTS {LOAD_SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {LOAD_SCHEMA}")
+        await conn.execute(f"SET search_path TO {LOAD_SCHEMA}, public")
+
+        print(f"Loading schema from {schema_file}...")
+        with open(schema_file, 'r') as f:
+            await conn.execute(f.read())
+
+        blobs = seed_images(os.path.abspath(os.path.join(upload_dir, "blobs")))
+        photo_params = [
+            [b["content_hash"] for b in blobs], [b["path"] for b in blobs],
+            [b["size"] for b in blobs], [b["web"] for b in blobs], [b["thumbnail"] for b in blobs],
+        ]
+
+        print(f"Seeding {rows:,} inventory rows...")
+        start = time.perf_counter()
+        for statement in SEED_SQL.split(';\n'):
+            if not statement.strip():
+                continue
+            if '$5' in statement:
+                await conn.execute(statement, *photo_params)
+            elif '$1' in statement:
+                await conn.execute(statement, rows)
+            else:
+                await conn.execute(statement)
+        print(f"  seeded in {time.perf_counter() - start:.1f}s")
+    finally:
+        await conn.close()
+
+def with_search_path(database_url):
+    """DATABASE_URL pointing the app's connections at the load test schema"""
+    separator = "&" if "?" in database_url else "?"
+    return f"{database_url}{separator}search_path={LOAD_SCHEMA},public"
+
+async def load_fixtures(database_url, rng):
+    """Ids the request builders pick from"""
+    conn = await asyncpg.connect(with_search_path(database_url))
+    try:
+        units = [r["inventory_id"] for r in await conn.fetch(
+            "SELECT inventory_id FROM inventory WHERE is_deleted = FALSE "
+            "ORDER BY random() LIMIT 2000"
+        )]
+        photos = [r["photo_id"] for r in await conn.fetch(
+            "SELECT photo_id FROM inventory_photos ORDER BY random() LIMIT 2000"
+        )]
+        hashes = {r["photo_id"]: r["content_hash"] for r in await conn.fetch(
+            "SELECT photo_id, content_hash FROM inventory_photos WHERE photo_id = ANY($1::int[])", photos
+        )}
+        supplier_id = await conn.fetchval("SELECT MIN(supplier_id) FROM suppliers")
+    finally:
+        await conn.close()
+    return {
+        "units": units,
+        "photos": photos,
+        "photo_etags": {pid: f'"{h}"' for pid, h in hashes.items()},
+        "supplier_id": supplier_id,
+        "run": f"{int(time.time()) % 100000:05d}{rng.randrange(100):02d}",
+        # Filled in as write scenarios create rows
+        "created_units": [],
+        "created_inspections": [],
+        "created_plans": [],
+    }
+
+# ---------------------------------------------------------------- DB timing
+
+# Server-side counters summed over all routes; diffed around each burst
+DB_METRICS = {
+    "http_request_db_seconds_total": "db_ms_mean",
+    "http_request_db_queries_total": "db_queries_mean",
+    "http_request_pool_wait_seconds_total": "pool_wait_ms_mean",
+}
+
+async def scrape_db_metrics(client):
+    """Sum the app's per-route DB counters from /metrics"""
+    totals = dict.fromkeys(DB_METRICS, 0.0)
+    response = await client.get("/metrics")
+    for line in response.text.splitlines():
+        name, _, value = line.partition("{")
+        if name in totals:
+            totals[name] += float(value.rsplit(" ", 1)[1])
+    return totals
+
+# ---------------------------------------------------------------- scenarios
+
+def jpeg_bytes(seed):
+    buf = io.BytesIO()
+    Image.effect_noise((1280, 720), 30 + seed % 20).convert("RGB").save(buf, "JPEG", quality=80)
+    return buf.getvalue()
+
+def new_unit(ctx, n, prefix):
+    serial = f"{ctx['run']}{n:06d}"
+    return {
+        "stock_number": f"{prefix}-{serial}",
+        "vin": f"{prefix}{serial}"[-17:].rjust(17, "0"),
+        "year": 2015 + n % 8,
+        "make": "Blue Bird",
+        "model": "Vision",
+        "supplier_id": ctx["supplier_id"],
+        "purchase_date": date.today().isoformat(),
+        "purchase_price_usd": "28500.00",
+        "features": ["Air Conditioning"],
+    }
+
+def bulk_csv(ctx, n, size=100):
+    lines = ["stock_number,vin,year,make,model,purchase_date,purchase_price_usd,features"]
+    for k in range(size):
+        unit = new_unit(ctx, n * size + k, "LB")
+        lines.append(
+            f"{unit['stock_number']},{unit['vin']},{unit['year']},{unit['make']},{unit['model']},"
+            f"{unit['purchase_date']},{unit['purchase_price_usd']},Air Conditioning|Camera System"
+        )
+    return "\n".join(lines).encode()
+
+def pick(ctx, key, rng):
+    return rng.choice(ctx[key])
+
+def revalidate_photo(ctx, n, rng):
+    photo_id = pick(ctx, "photos", rng)
+    return {"method": "GET", "url": f"/api/photos/{photo_id}",
+            "headers": {"If-None-Match": ctx["photo_etags"][photo_id]}}
+
+# (name, builder, is_write); a builder returns keyword arguments for httpx's request()
+SCENARIOS = [
+    ("GET /api/exchange-rates/current",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/exchange-rates/current"}, False),
+    ("GET /api/exchange-rates/cache-stats",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/exchange-rates/cache-stats"}, False),
+    ("GET /api/exchange-rates",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/exchange-rates"}, False),
+    ("GET /api/suppliers",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/suppliers"}, False),
+    ("GET /api/inspections/pre-purchase",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/inspections/pre-purchase",
+                          "params": {"decision": "Approved"}}, False),
+    ("GET /api/inventory",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/inventory"}, False),
+    ("GET /api/inventory?offset=5000",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/inventory", "params": {"offset": 5000}}, False),
+    ("GET /api/inventory?pagination=cursor",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/inventory",
+                          "params": {"pagination": "cursor", "cursor": ctx.get("cursor")}}, False),
+    ("GET /api/inventory?fields=summary",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/inventory", "params": {"fields": "summary"}}, False),
+    ("GET /api/inventory?status=",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/inventory", "params": {"status": "In Stock (US)"}}, False),
+    ("GET /api/inventory?make=",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/inventory", "params": {"make": "thomas"}}, False),
+    ("GET /api/inventory/{id}",
+     lambda ctx, n, rng: {"method": "GET", "url": f"/api/inventory/{pick(ctx, 'units', rng)}"}, False),
+    ("GET /api/inventory/{id}/work-plans",
+     lambda ctx, n, rng: {"method": "GET", "url": f"/api/inventory/{pick(ctx, 'units', rng)}/work-plans"}, False),
+    ("GET /api/inventory/{id}/photos",
+     lambda ctx, n, rng: {"method": "GET", "url": f"/api/inventory/{pick(ctx, 'units', rng)}/photos"}, False),
+    ("GET /api/inventory/{id}/warranty-claims",
+     lambda ctx, n, rng: {"method": "GET", "url": f"/api/inventory/{pick(ctx, 'units', rng)}/warranty-claims"}, False),
+    ("GET /api/photos/{id}",
+     lambda ctx, n, rng: {"method": "GET", "url": f"/api/photos/{pick(ctx, 'photos', rng)}"}, False),
+    ("GET /api/photos/{id}?variant=thumbnail",
+     lambda ctx, n, rng: {"method": "GET", "url": f"/api/photos/{pick(ctx, 'photos', rng)}",
+                          "params": {"variant": "thumbnail"}}, False),
+    ("GET /api/photos/{id} (Range)",
+     lambda ctx, n, rng: {"method": "GET", "url": f"/api/photos/{pick(ctx, 'photos', rng)}",
+                          "headers": {"Range": "bytes=0-65535"}}, False),
+    ("GET /api/photos/{id} (If-None-Match)", revalidate_photo, False),
+    ("GET /api/reports/dashboard",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/reports/dashboard"}, False),
+    ("GET /api/reports/us-inventory",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/reports/us-inventory"}, False),
+    ("GET /api/reports/us-inventory?format=csv",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/reports/us-inventory", "params": {"format": "csv"}}, False),
+    ("GET /api/reports/mexico-inventory",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/reports/mexico-inventory"}, False),
+    ("GET /api/reports/sold-pending",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/reports/sold-pending",
+                          "params": {"format": "ndjson"}}, False),
+    ("GET /api/reports/warranty-active",
+     lambda ctx, n, rng: {"method": "GET", "url": "/api/reports/warranty-active"}, False),
+
+    ("POST /api/exchange-rates",
+     lambda ctx, n, rng: {"method": "POST", "url": "/api/exchange-rates",
+                          "json": {"rate": f"{17 + rng.random():.4f}"}}, True),
+    ("POST /api/suppliers",
+     lambda ctx, n, rng: {"method": "POST", "url": "/api/suppliers",
+                          "json": {"company_name": f"Load Test Supplier {ctx['run']}-{n}",
+                                   "supplier_type": "Auction"}}, True),
+    ("POST /api/inspections/pre-purchase",
+     lambda ctx, n, rng: {"method": "POST", "url": "/api/inspections/pre-purchase",
+                          "json": {"vin": new_unit(ctx, n, "LI")["vin"], "year": 2018, "make": "IC Bus",
+                                   "model": "CE", "inspection_date": date.today().isoformat(),
+                                   "overall_rating": "Good"}}, True),
+    ("PATCH /api/inspections/pre-purchase/{id}/decision",
+     lambda ctx, n, rng: {"method": "PATCH",
+                          "url": f"/api/inspections/pre-purchase/{pick(ctx, 'created_inspections', rng)}/decision",
+                          "params": {"decision": "Approved"}}, True),
+    ("POST /api/inventory",
+     lambda ctx, n, rng: {"method": "POST", "url": "/api/inventory", "json": new_unit(ctx, n, "LT")}, True),
+    ("POST /api/inventory/bulk (100 rows)",
+     lambda ctx, n, rng: {"method": "POST", "url": "/api/inventory/bulk", "params": {"format": "csv"},
+                          "content": bulk_csv(ctx, n)}, True),
+    ("PATCH /api/inventory/{id}",
+     lambda ctx, n, rng: {"method": "PATCH", "url": f"/api/inventory/{pick(ctx, 'created_units', rng)}",
+                          "json": {"asking_price": str(30000 + n), "status": "In Stock (US)"}}, True),
+    ("POST /api/inventory/{id}/work-plan",
+     lambda ctx, n, rng: {"method": "POST", "url": f"/api/inventory/{pick(ctx, 'created_units', rng)}/work-plan",
+                          "json": {"plan_type": "Delivery", "origin_location": "US Stock - Laredo",
+                                   "destination_location": "Monterrey", "estimated_cost": "18000",
+                                   "cost_currency": "MXN"}}, True),
+    ("PATCH /api/work-plans/{id}/complete",
+     lambda ctx, n, rng: {"method": "PATCH", "url": f"/api/work-plans/{pick(ctx, 'created_plans', rng)}/complete",
+                          "params": {"actual_cost": "18500", "actual_days": 4}}, True),
+    ("POST /api/inventory/{id}/photos",
+     lambda ctx, n, rng: {"method": "POST", "url": f"/api/inventory/{pick(ctx, 'created_units', rng)}/photos",
+                          "files": {"file": (f"load{n}.jpg", ctx["upload_images"][n % len(ctx["upload_images"])],
+                                             "image/jpeg")},
+                          "data": {"photo_type": "Exterior"}}, True),
+    ("POST /api/inventory/{id}/warranty-claim",
+     lambda ctx, n, rng: {"method": "POST",
+                          "url": f"/api/inventory/{pick(ctx, 'created_units', rng)}/warranty-claim",
+                          "json": {"claim_date": date.today().isoformat(), "claim_type": "Engine",
+                                   "description": "Load test claim"}}, True),
+    ("DELETE /api/inventory/{id}",
+     lambda ctx, n, rng: {"method": "DELETE", "url": f"/api/inventory/{ctx['created_units'].pop()}"}, True),
+]
+
+def record_created(name, response, ctx):
+    """Keep ids created by write scenarios so later ones can target them"""
+    if response.status_code >= 300:
+        return
+    if name == "POST /api/inventory":
+        ctx["created_units"].append(response.json()["inventory_id"])
+    elif name == "POST /api/inspections/pre-purchase":
+        ctx["created_inspections"].append(response.json()["inspection_id"])
+    elif name == "POST /api/inventory/{id}/work-plan":
+        ctx["created_plans"].append(response.json()["plan_id"])
+
+# ---------------------------------------------------------------- running
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run_scenario(client, name, builder, ctx, requests, concurrency, seed):
+    rng = random.Random(seed)
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for n in counter:
+            kwargs = builder(ctx, n, rng)
+            start = time.perf_counter()
+            response = await client.request(**kwargs)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            record_created(name, response, ctx)
+
+    before = await scrape_db_metrics(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    after = await scrape_db_metrics(client)
+
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p95_ms": percentile(latencies, 95) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "mean_ms": statistics.mean(latencies) * 1e3,
+        "db_ms_mean": (after["http_request_db_seconds_total"] - before["http_request_db_seconds_total"])
+                      / requests * 1e3,
+        "db_queries_mean": (after["http_request_db_queries_total"] - before["http_request_db_queries_total"])
+                           / requests,
+        "pool_wait_ms_mean": (after["http_request_pool_wait_seconds_total"]
+                              - before["http_request_pool_wait_seconds_total"]) / requests * 1e3,
+    }
+
+@asynccontextmanager
+async def in_process_client(database_url):
+    """httpx client wired straight into the app; no sockets involved"""
+    import backend_api_FINAL as api
+
+    api.DATABASE_URL = with_search_path(database_url)
+    async with api.lifespan(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=120) as client:
+            yield client
+
+async def run_load(args, database_url):
+    rng = random.Random(args.seed)
+    ctx = await load_fixtures(database_url, rng)
+    ctx["upload_images"] = [jpeg_bytes(k) for k in range(8)]
+
+    selected = [s for s in SCENARIOS if not args.only or any(o in s[0] for o in args.only)]
+    if args.read_only:
+        selected = [s for s in selected if not s[2]]
+
+    if args.url:
+        client_cm = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        client_cm = in_process_client(database_url)
+
+    results = {}
+    async with client_cm as client:
+        first_page = await client.get("/api/inventory", params={"pagination": "cursor"})
+        ctx["cursor"] = first_page.json().get("next_cursor")
+        # Writes that need rows of their own get them before their burst
+        if any(s[2] and "{id}" in s[0] for s in selected):
+            seed_writes = [s for s in SCENARIOS if s[0] in (
+                "POST /api/inventory", "POST /api/inspections/pre-purchase", "POST /api/inventory/{id}/work-plan"
+            )]
+            for name, builder, _ in seed_writes:
+                for n in range(10):
+                    record_created(name, await client.request(**builder(ctx, 900000 + n, rng)), ctx)
+
+        print(f"\n{'endpoint':<52} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'db':>8} {'qry':>5} {'err':>5}")
+        for index, (name, builder, _) in enumerate(selected):
+            requests = args.requests
+            if name == "DELETE /api/inventory/{id}":
+                # Each delete consumes one unit created earlier in the run
+                requests = min(requests, len(ctx["created_units"]) - args.warmup)
+            for n in range(args.warmup):
+                await client.request(**builder(ctx, 800000 + n, rng))
+            result = await run_scenario(
+                client, name, builder, ctx, requests, args.concurrency, args.seed + index
+            )
+            results[name] = result
+            print(f"{name:<52} {result['throughput_rps']:>8.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['db_ms_mean']:>8.1f} "
+                  f"{result['db_queries_mean']:>5.1f} {result['errors']:>5}")
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before_path} ({before.get('commit')}) -> {after_path} ({after.get('commit')})\n")
+    print(f"{'endpoint':<52} {'p50 ms':>16} {'p95 ms':>16} {'rps':>16}")
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if not old:
+            print(f"{name:<52} (new)")
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "throughput_rps"):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{new[key]:>8.1f} {change:>+6.0f}%")
+        print(f"{name:<52} {' '.join(cells)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic fleet and load test every endpoint")
+    parser.add_argument("--rows", type=int, default=100_000, help="inventory rows to seed")
+    parser.add_argument("--schema-file", default="bus_inventory_schema_FINAL.sql")
+    parser.add_argument("--upload-dir", default=os.path.join(tempfile.gettempdir(), "ba_load_test_uploads"),
+                        help="where seeded and uploaded photos are stored")
+    parser.add_argument("--reuse", action="store_true", help=f"keep an existing {LOAD_SCHEMA} schema")
+    parser.add_argument("--seed-only", action="store_true", help="seed and exit")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per endpoint")
+    parser.add_argument("--only", action="append", help="only endpoints containing this text (repeatable)")
+    parser.add_argument("--read-only", action="store_true", help="skip write endpoints")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for request parameters")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two --json results")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+    os.environ["UPLOAD_DIR"] = args.upload_dir
+
+    print("=" * 50)
+    print("Buses America - API Load Test")
+    print("=" * 50)
+
+    asyncio.run(seed(database_url, args.schema_file, args.rows, args.upload_dir, args.reuse))
+    if args.seed_only:
+        print(f"\nStart a server with DATABASE_URL={with_search_path(database_url)}")
+        return
+
+    results = asyncio.run(run_load(args, database_url))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "target": args.url or "in-process",
+                "rows": args.rows,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 -- Buses America - Final Database Schema
 -- Used School Bus Dealer with US Stock and Mexico Import Operations
 
+-- Free text (descriptions, notes, issues) is written in English or Spanish,
+-- often both in one record, so it is indexed under both stemmers. Names, VINs
+-- and stock numbers use 'simple' (no stemming) and are matched by prefix.
+CREATE FUNCTION bilingual_tsvector(body TEXT) RETURNS tsvector AS $$
+    SELECT to_tsvector('english', coalesce(body, '')) || to_tsvector('spanish', coalesce(body, ''))
+$$ LANGUAGE sql IMMUTABLE;
+
 -- Exchange Rate Management
 CREATE TABLE exchange_rates (
     rate_id SERIAL PRIMARY KEY,
@@ -118,6 +125,21 @@ CREATE TABLE pre_purchase_inspections (
     -- Link to inventory if purchased
     inventory_id INTEGER,
     
+    -- GET /api/search
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(vin, '') || ' ' || coalesce(stock_number_temp, '')), 'A') ||
+        setweight(to_tsvector('simple',
+            coalesce(year::text, '') || ' ' || coalesce(make, '') || ' ' || coalesce(model, '')), 'B') ||
+        setweight(bilingual_tsvector(
+            coalesce(engine_notes, '') || ' ' || coalesce(transmission_notes, '') || ' ' ||
+            coalesce(suspension_notes, '') || ' ' || coalesce(chassis_notes, '') || ' ' ||
+            coalesce(brake_notes, '') || ' ' || coalesce(electrical_notes, '') || ' ' ||
+            coalesce(interior_notes, '') || ' ' || coalesce(road_test_notes, '') || ' ' ||
+            coalesce(decision_notes, '')), 'C') ||
+        setweight(to_tsvector('simple',
+            coalesce(inspector_name, '') || ' ' || coalesce(inspection_location, '')), 'D')
+    ) STORED,
+    
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     created_by VARCHAR(100)
 );
@@ -282,8 +304,8 @@ CREATE TABLE inventory (
         END
     ) STORED,
     
-    days_in_us_stock INTEGER, -- Manually updated or calculated
-    days_in_mexico_stock INTEGER, -- For units imported before sale
+    days_in_us_stock INTEGER, -- Not maintained; the API reports them from inventory_stock_days
+    days_in_mexico_stock INTEGER, -- Not maintained; the API reports them from inventory_stock_days
     
     days_in_warranty INTEGER GENERATED ALWAYS AS (
         CASE
@@ -301,6 +323,18 @@ CREATE TABLE inventory (
     -- Link to pre-purchase inspection
     pre_inspection_id INTEGER REFERENCES pre_purchase_inspections(inspection_id),
     
+    -- GET /api/search (not part of any API model; reports list columns explicitly)
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', stock_number || ' ' || vin), 'A') ||
+        setweight(to_tsvector('simple',
+            year::text || ' ' || make || ' ' || model || ' ' ||
+            coalesce(body_style, '') || ' ' || coalesce(bus_type, '')), 'B') ||
+        setweight(to_tsvector('simple',
+            coalesce(client_name, '') || ' ' || coalesce(client_company, '')), 'B') ||
+        setweight(bilingual_tsvector(description), 'C') ||
+        setweight(bilingual_tsvector(internal_notes), 'D')
+    ) STORED,
+    
     -- Metadata
     created_by VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -317,6 +351,13 @@ CREATE TABLE inventory_photos (
     file_url VARCHAR(500),
     file_size INTEGER,
     mime_type VARCHAR(50),
+    -- SHA-256 of the original; its blob-store key and strong ETag
+    content_hash CHAR(64),
+    -- Resized JPEG variants stored next to the original
+    web_path VARCHAR(500),
+    thumbnail_path VARCHAR(500),
+    width INTEGER,
+    height INTEGER,
     photo_type VARCHAR(50), -- 'Exterior', 'Interior', 'Engine', 'Damage', 'Pre-Purchase'
     is_primary BOOLEAN DEFAULT FALSE,
     display_order INTEGER DEFAULT 0,
@@ -412,6 +453,13 @@ CREATE TABLE client_followup (
     issues_reported TEXT,
     notes TEXT,
     contacted_by VARCHAR(100),
+    -- GET /api/search
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', client_name), 'A') ||
+        setweight(bilingual_tsvector(coalesce(issues_reported, '') || ' ' || coalesce(notes, '')), 'B') ||
+        setweight(to_tsvector('simple',
+            coalesce(followup_type, '') || ' ' || coalesce(bus_performance, '')), 'D')
+    ) STORED,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -442,16 +490,166 @@ CREATE TABLE work_plans (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Dashboard Summary (single row, maintained by maintain_dashboard_summary trigger)
+CREATE TABLE dashboard_summary (
+    summary_id INTEGER PRIMARY KEY DEFAULT 1 CHECK (summary_id = 1),
+    total_units BIGINT NOT NULL DEFAULT 0,
+    us_inventory BIGINT NOT NULL DEFAULT 0,
+    mexico_inventory BIGINT NOT NULL DEFAULT 0,
+    available_for_sale BIGINT NOT NULL DEFAULT 0,
+    sold_pending_delivery BIGINT NOT NULL DEFAULT 0,
+    delivered BIGINT NOT NULL DEFAULT 0,
+    under_warranty BIGINT NOT NULL DEFAULT 0,
+    us_inventory_value DECIMAL(14,2) NOT NULL DEFAULT 0,
+    -- Undelivered units and the sum of their purchase dates (days since 1970-01-01),
+    -- so the average age is computed at read time and never goes stale
+    open_units BIGINT NOT NULL DEFAULT 0,
+    open_purchase_day_sum BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO dashboard_summary (summary_id) VALUES (1);
+
+-- Daily inventory snapshots for GET /api/reports/trends: one row per day,
+-- location, status and sold flag, written by take_inventory_snapshot().
+-- Partitioned by year (the function creates partitions as needed) so old
+-- years can be dropped whole.
+CREATE TABLE inventory_snapshots (
+    snapshot_date DATE NOT NULL,
+    current_location VARCHAR(100) NOT NULL, -- 'Unknown' for units without one
+    status VARCHAR(50) NOT NULL,
+    is_sold BOOLEAN NOT NULL,
+    units INTEGER NOT NULL,
+    us_stock_cost_usd DECIMAL(14,2) NOT NULL, -- sum of cost_in_us_stock_usd
+    landed_cost_usd DECIMAL(14,2) NOT NULL,   -- sum of total_cost_usd
+    age_day_sum BIGINT NOT NULL,              -- sum of snapshot_date - purchase_date
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (snapshot_date, current_location, status, is_sold)
+) PARTITION BY RANGE (snapshot_date);
+
+-- Stage durations: each unit's status history as (status, entered, left)
+-- intervals. Rebuilt by refresh_stage_intervals() (run by refresh_stage_intervals.py
+-- on a schedule) for the units queued in stage_intervals_pending, which the
+-- history and inventory triggers fill.
+CREATE TABLE inventory_stage_intervals (
+    inventory_id INTEGER NOT NULL, -- no FK: deleting a unit's history queues its rebuild, which clears it
+    seq INTEGER NOT NULL, -- order within the unit's history
+    status VARCHAR(50) NOT NULL,
+    stage VARCHAR(20) NOT NULL, -- pipeline_stage(status)
+    entered_at TIMESTAMP NOT NULL,
+    left_at TIMESTAMP, -- NULL while the unit is still in this status
+    PRIMARY KEY (inventory_id, seq)
+);
+
+-- Per-unit stock day counts, rebuilt with the unit's intervals. Open stays are
+-- kept as their start date so the count grows by itself: days in US stock are
+-- us_stock_days + (CURRENT_DATE - us_stock_since). No row: never in stock.
+CREATE TABLE inventory_stock_days (
+    inventory_id INTEGER PRIMARY KEY,
+    us_stock_days INTEGER, -- completed US Stock stays; NULL if never in US stock
+    us_stock_since DATE, -- start of the open US Stock stay, if any
+    mexico_stock_days INTEGER, -- completed Mexico Stock stays; NULL if never in Mexico stock
+    mexico_stock_since DATE -- start of the open Mexico Stock stay, if any
+);
+
+CREATE TABLE stage_intervals_pending (
+    inventory_id INTEGER PRIMARY KEY
+);
+
+-- Single row: a generation bumped on every rebuild so readers can cache what
+-- they derive
+CREATE TABLE stage_intervals_state (
+    state_id INTEGER PRIMARY KEY DEFAULT 1 CHECK (state_id = 1),
+    generation BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO stage_intervals_state (state_id) VALUES (1);
+
+-- Extensions
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Indexes
-CREATE INDEX idx_inventory_vin ON inventory(vin);
-CREATE INDEX idx_inventory_stock_number ON inventory(stock_number);
-CREATE INDEX idx_inventory_status ON inventory(status);
-CREATE INDEX idx_inventory_is_sold ON inventory(is_sold);
-CREATE INDEX idx_inventory_current_location ON inventory(current_location);
+-- Every listing and report filters on is_deleted = FALSE, so the inventory
+-- indexes below are partial on live rows and end with the ORDER BY columns.
+-- VINs and stock numbers are matched exactly and by prefix (LIKE 'x%'), which
+-- a default-collation btree can't serve; text_pattern_ops handles both
+CREATE INDEX idx_inventory_vin ON inventory(vin text_pattern_ops);
+CREATE INDEX idx_inventory_stock_number ON inventory(stock_number text_pattern_ops);
 CREATE INDEX idx_inventory_supplier ON inventory(supplier_id);
-CREATE INDEX idx_inventory_warranty_status ON inventory(warranty_status);
-CREATE INDEX idx_pre_inspection_vin ON pre_purchase_inspections(vin);
+CREATE INDEX idx_pre_inspection_vin ON pre_purchase_inspections(vin text_pattern_ops);
+CREATE INDEX idx_inventory_photos_inventory
+    ON inventory_photos(inventory_id, is_primary DESC, display_order, uploaded_at);
+-- One row per distinct image per unit; blobs themselves are shared across units
+CREATE UNIQUE INDEX idx_inventory_photos_unit_hash ON inventory_photos(inventory_id, content_hash);
+CREATE INDEX idx_inventory_photos_content_hash ON inventory_photos(content_hash);
 CREATE INDEX idx_exchange_rate_date ON exchange_rates(effective_date DESC);
+-- Landed cost rollup (landed_cost_lines) reads a unit's cost items and work plans
+CREATE INDEX idx_cost_items_inventory ON cost_items(inventory_id);
+CREATE INDEX idx_work_plans_inventory ON work_plans(inventory_id);
+-- Stage interval rebuilds read a unit's status history in order
+CREATE INDEX idx_status_history_inventory ON inventory_status_history(inventory_id, changed_at, history_id);
+-- Units still in a status: current occupants per stage, open stock stays
+CREATE INDEX idx_stage_intervals_open ON inventory_stage_intervals(stage) WHERE left_at IS NULL;
+
+-- GET /api/inventory (no filter / keyset pagination): ORDER BY created_at DESC, inventory_id DESC
+CREATE INDEX idx_inventory_created_at_id ON inventory(created_at DESC, inventory_id DESC)
+    WHERE is_deleted = FALSE;
+
+-- GET /api/inventory filtered by status / current_location / is_sold / supplier_id
+CREATE INDEX idx_inventory_status_created ON inventory(status, created_at DESC, inventory_id DESC)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_inventory_location_created ON inventory(current_location, created_at DESC, inventory_id DESC)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_inventory_sold_created ON inventory(is_sold, created_at DESC, inventory_id DESC)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_inventory_supplier_created ON inventory(supplier_id, created_at DESC, inventory_id DESC)
+    WHERE is_deleted = FALSE;
+
+-- GET /api/inventory?make= (ILIKE '%x%' needs trigrams, a btree can't serve it)
+CREATE INDEX idx_inventory_make_trgm ON inventory USING gin (make gin_trgm_ops)
+    WHERE is_deleted = FALSE;
+
+-- GET /api/vin-lookup?match=suffix: "last 6" lookups as a prefix match on the reversed VIN
+CREATE INDEX idx_inventory_vin_reverse ON inventory(reverse(vin) text_pattern_ops)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_pre_inspection_vin_reverse ON pre_purchase_inspections(reverse(vin) text_pattern_ops);
+
+-- GET /api/search: full text over each searchable table, trigrams for VIN /
+-- stock number fragments (ILIKE '%x%') and misspelled names (word_similarity)
+CREATE INDEX idx_inventory_search ON inventory USING gin (search_vector)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_inventory_vin_trgm ON inventory USING gin (vin gin_trgm_ops)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_inventory_stock_number_trgm ON inventory USING gin (stock_number gin_trgm_ops)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_inventory_make_model_trgm ON inventory USING gin ((make || ' ' || model) gin_trgm_ops)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_inventory_client_trgm ON inventory USING gin (client_name gin_trgm_ops)
+    WHERE is_deleted = FALSE;
+CREATE INDEX idx_pre_inspection_search ON pre_purchase_inspections USING gin (search_vector);
+CREATE INDEX idx_pre_inspection_vin_trgm ON pre_purchase_inspections USING gin (vin gin_trgm_ops);
+CREATE INDEX idx_client_followup_search ON client_followup USING gin (search_vector);
+CREATE INDEX idx_client_followup_client_trgm ON client_followup USING gin (client_name gin_trgm_ops);
+
+-- us_inventory / mexico_inventory views: location filter, ORDER BY purchase_date DESC
+CREATE INDEX idx_inventory_location_purchase ON inventory(current_location, purchase_date DESC)
+    WHERE is_deleted = FALSE;
+
+-- sold_pending_delivery view: ORDER BY sale_date
+CREATE INDEX idx_inventory_sold_pending ON inventory(sale_date)
+    WHERE is_sold = TRUE AND status != 'Delivered' AND is_deleted = FALSE;
+
+-- GET /api/reports/profitability?date_from=&date_to=: sold units by sale date
+CREATE INDEX idx_inventory_sale_date ON inventory(sale_date)
+    WHERE is_sold = TRUE AND is_deleted = FALSE;
+
+-- units_under_warranty view: warranty_end_date >= CURRENT_DATE ORDER BY warranty_end_date
+CREATE INDEX idx_inventory_warranty_active ON inventory(warranty_end_date)
+    WHERE warranty_status = 'Active' AND is_deleted = FALSE;
+
+-- current_exchange_rate view: latest active rate
+CREATE INDEX idx_exchange_rate_active ON exchange_rates(effective_date DESC, rate_id DESC)
+    WHERE is_active = TRUE;
 
 -- Triggers
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -471,20 +669,29 @@ CREATE TRIGGER update_suppliers_updated_at BEFORE UPDATE ON suppliers
 CREATE TRIGGER update_warranty_claims_updated_at BEFORE UPDATE ON warranty_claims
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- Track status changes
+-- Track status changes. Statement-level so a batch move writes all its history
+-- rows in one INSERT; the API can set buses_america.change_reason for the
+-- transaction to record why. EXECUTE plans the join for each statement's row
+-- count: a cached plan from a zero-row UPDATE nested-loops large ones.
 CREATE OR REPLACE FUNCTION track_status_change()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF OLD.status IS DISTINCT FROM NEW.status THEN
-        INSERT INTO inventory_status_history (inventory_id, old_status, new_status, changed_by)
-        VALUES (NEW.inventory_id, OLD.status, NEW.status, CURRENT_USER);
-    END IF;
-    RETURN NEW;
+    EXECUTE $q$
+        INSERT INTO inventory_status_history (inventory_id, old_status, new_status, changed_by, change_reason)
+        SELECT n.inventory_id, o.status, n.status, CURRENT_USER,
+               NULLIF(current_setting('buses_america.change_reason', TRUE), '')
+        FROM new_rows n
+        JOIN old_rows o ON o.inventory_id = n.inventory_id
+        WHERE o.status IS DISTINCT FROM n.status
+        ORDER BY n.inventory_id
+    $q$;
+    RETURN NULL;
 END;
 $$ language 'plpgsql';
 
 CREATE TRIGGER track_inventory_status_changes AFTER UPDATE ON inventory
-    FOR EACH ROW EXECUTE FUNCTION track_status_change();
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_status_change();
 
 -- Auto-calculate warranty dates (60 days from delivery)
 CREATE OR REPLACE FUNCTION calculate_warranty_dates()
@@ -517,6 +724,455 @@ $$ language 'plpgsql';
 CREATE TRIGGER auto_update_is_sold BEFORE UPDATE ON inventory
     FOR EACH ROW EXECUTE FUNCTION update_is_sold_flag();
 
+-- Keep dashboard_summary in step with inventory. Statement-level so bulk
+-- writes touch the summary row once; deltas are +1 for new rows, -1 for old.
+CREATE OR REPLACE FUNCTION maintain_dashboard_summary()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_rows TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changed_rows := 'SELECT 1 AS sign, * FROM new_rows';
+    ELSIF TG_OP = 'DELETE' THEN
+        changed_rows := 'SELECT -1 AS sign, * FROM old_rows';
+    ELSE
+        changed_rows := 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1 AS sign, * FROM old_rows';
+    END IF;
+
+    EXECUTE format($q$
+        UPDATE dashboard_summary s SET
+            total_units = s.total_units + d.total_units,
+            us_inventory = s.us_inventory + d.us_inventory,
+            mexico_inventory = s.mexico_inventory + d.mexico_inventory,
+            available_for_sale = s.available_for_sale + d.available_for_sale,
+            sold_pending_delivery = s.sold_pending_delivery + d.sold_pending_delivery,
+            delivered = s.delivered + d.delivered,
+            under_warranty = s.under_warranty + d.under_warranty,
+            us_inventory_value = s.us_inventory_value + d.us_inventory_value,
+            open_units = s.open_units + d.open_units,
+            open_purchase_day_sum = s.open_purchase_day_sum + d.open_purchase_day_sum,
+            updated_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT
+                COALESCE(SUM(sign), 0) AS total_units,
+                COALESCE(SUM(sign) FILTER (WHERE current_location = 'US Stock'), 0) AS us_inventory,
+                COALESCE(SUM(sign) FILTER (WHERE current_location = 'Mexico Stock'), 0) AS mexico_inventory,
+                COALESCE(SUM(sign) FILTER (WHERE is_sold = FALSE), 0) AS available_for_sale,
+                COALESCE(SUM(sign) FILTER (WHERE is_sold = TRUE AND status != 'Delivered'), 0) AS sold_pending_delivery,
+                COALESCE(SUM(sign) FILTER (WHERE status = 'Delivered'), 0) AS delivered,
+                COALESCE(SUM(sign) FILTER (WHERE warranty_status = 'Active'), 0) AS under_warranty,
+                COALESCE(SUM(sign * cost_in_us_stock_usd) FILTER (WHERE current_location = 'US Stock'), 0) AS us_inventory_value,
+                COALESCE(SUM(sign) FILTER (WHERE status != 'Delivered'), 0) AS open_units,
+                COALESCE(SUM(sign * (purchase_date - DATE '1970-01-01')) FILTER (WHERE status != 'Delivered'), 0) AS open_purchase_day_sum
+            FROM (%s) changed
+            WHERE is_deleted = FALSE
+        ) d
+        WHERE s.summary_id = 1
+          AND (d.total_units, d.us_inventory, d.mexico_inventory, d.available_for_sale,
+               d.sold_pending_delivery, d.delivered, d.under_warranty, d.us_inventory_value,
+               d.open_units, d.open_purchase_day_sum)
+              IS DISTINCT FROM (0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    $q$, changed_rows);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER dashboard_summary_insert AFTER INSERT ON inventory
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_dashboard_summary();
+
+CREATE TRIGGER dashboard_summary_update AFTER UPDATE ON inventory
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_dashboard_summary();
+
+CREATE TRIGGER dashboard_summary_delete AFTER DELETE ON inventory
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_dashboard_summary();
+
+-- Tell API workers to drop their cached exchange rates (LISTEN exchange_rates_changed)
+CREATE OR REPLACE FUNCTION notify_exchange_rates_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('exchange_rates_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER exchange_rates_changed AFTER INSERT OR UPDATE OR DELETE ON exchange_rates
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_exchange_rates_changed();
+
+-- Landed cost. A unit's costs come from three places: cost_items, completed
+-- work plans (Acquisition = transport to stock, Delivery = transport to client)
+-- and the cost columns on inventory. They overlap, so each cost category is
+-- taken from the most detailed source that has it: cost items, else completed
+-- work plans, else the inventory columns. Every line is converted at the
+-- USD/MXN rate effective on the day it was incurred.
+
+-- Active USD/MXN rate on a day; the oldest rate stands in for earlier days.
+-- plpgsql rather than sql so the lookup's plan is cached, not made per call
+CREATE OR REPLACE FUNCTION usd_mxn_rate(day DATE)
+RETURNS DECIMAL AS $$
+DECLARE
+    result DECIMAL;
+BEGIN
+    SELECT rate INTO result FROM exchange_rates
+    WHERE is_active = TRUE AND from_currency = 'USD' AND to_currency = 'MXN' AND effective_date <= day
+    ORDER BY effective_date DESC, rate_id DESC LIMIT 1;
+    IF result IS NULL THEN
+        SELECT rate INTO result FROM exchange_rates
+        WHERE is_active = TRUE AND from_currency = 'USD' AND to_currency = 'MXN'
+        ORDER BY effective_date, rate_id LIMIT 1;
+    END IF;
+    RETURN result;
+END;
+$$ language 'plpgsql' STABLE;
+
+CREATE OR REPLACE FUNCTION landed_cost_lines(unit inventory)
+RETURNS TABLE (
+    source TEXT,
+    source_id INTEGER,
+    cost_category VARCHAR,
+    description TEXT,
+    amount DECIMAL,
+    currency VARCHAR,
+    date_incurred DATE,
+    exchange_rate DECIMAL,
+    amount_usd DECIMAL,
+    amount_mxn DECIMAL
+) AS $$
+    WITH items AS (
+        SELECT 'cost_item'::TEXT AS source, c.cost_id AS source_id,
+               COALESCE(c.cost_category, 'Other')::VARCHAR AS cost_category, c.description,
+               c.amount::DECIMAL AS amount, c.currency::VARCHAR AS currency,
+               COALESCE(c.date_incurred, c.created_at::DATE) AS date_incurred
+        FROM cost_items c
+        WHERE c.inventory_id = unit.inventory_id
+    ), plans AS (
+        SELECT 'work_plan'::TEXT, w.plan_id, p.cost_category,
+               concat_ws(' → ', w.origin_location, w.destination_location),
+               w.actual_cost::DECIMAL, COALESCE(w.cost_currency, 'USD')::VARCHAR,
+               COALESCE(w.completion_date, w.created_date)
+        FROM work_plans w
+        CROSS JOIN LATERAL (SELECT (CASE w.plan_type
+            WHEN 'Acquisition' THEN 'Transport to Stock'
+            WHEN 'Delivery' THEN 'Transport to Client'
+            ELSE 'Other' END)::VARCHAR AS cost_category) p
+        WHERE w.inventory_id = unit.inventory_id AND w.completed = TRUE AND w.actual_cost IS NOT NULL
+          AND p.cost_category NOT IN (SELECT i.cost_category FROM items i)
+    ), unit_columns AS (
+        SELECT 'inventory'::TEXT, NULL::INTEGER, u.cost_category, u.description,
+               u.amount, u.currency, u.date_incurred
+        FROM (VALUES
+            ('Purchase', 'Purchase price', unit.purchase_price_usd, 'USD', unit.purchase_date),
+            ('Transport to Stock', 'Transport to US stock', unit.transport_to_stock_cost_usd, 'USD',
+             unit.purchase_date),
+            ('Initial Reconditioning', 'Initial reconditioning', unit.initial_reconditioning_cost_usd, 'USD',
+             unit.purchase_date),
+            ('Other', 'Other acquisition costs', unit.other_acquisition_costs_usd, 'USD', unit.purchase_date),
+            ('Import', 'Import costs', unit.import_cost_mxn, 'MXN',
+             COALESCE(unit.import_started_date, unit.sale_date, unit.purchase_date)),
+            ('Import', 'Regulatory compliance', unit.regulatory_cost_mxn, 'MXN',
+             COALESCE(unit.import_started_date, unit.sale_date, unit.purchase_date)),
+            ('Import', 'Other import costs', unit.other_import_costs_mxn, 'MXN',
+             COALESCE(unit.import_started_date, unit.sale_date, unit.purchase_date)),
+            ('Customs', 'Customs', unit.customs_cost_mxn, 'MXN',
+             COALESCE(unit.import_completed_date, unit.import_started_date, unit.sale_date, unit.purchase_date)),
+            ('Preventive Maintenance', 'Preventive maintenance', unit.preventive_maintenance_cost,
+             COALESCE(unit.preventive_maintenance_currency, 'USD'),
+             COALESCE(unit.preventive_maintenance_date, unit.sale_date, unit.purchase_date)),
+            ('Transport to Client', 'Transport to client', unit.transport_to_client_cost_mxn, 'MXN',
+             COALESCE(unit.delivery_date, unit.import_completed_date, unit.sale_date, unit.purchase_date)),
+            ('Other', 'Other costs after sale', unit.other_costs_after_sale, COALESCE(unit.other_costs_currency, 'USD'),
+             COALESCE(unit.sale_date, unit.purchase_date))
+        ) u(cost_category, description, amount, currency, date_incurred)
+        WHERE u.amount <> 0
+          AND u.cost_category NOT IN (SELECT i.cost_category FROM items i UNION ALL SELECT p.cost_category FROM plans p)
+    ), lines AS MATERIALIZED (
+        -- Materialized so each line looks its rate up once, not once per use
+        SELECT l.*, usd_mxn_rate(l.date_incurred) AS rate
+        FROM (
+            SELECT * FROM items
+            UNION ALL SELECT * FROM plans
+            UNION ALL SELECT * FROM unit_columns
+        ) l
+    )
+    SELECT source, source_id, cost_category, description, amount, currency, date_incurred, rate,
+           CASE WHEN currency = 'MXN' THEN round(amount / rate, 2) ELSE amount END,
+           CASE WHEN currency = 'MXN' THEN amount ELSE round(amount * rate, 2) END
+    FROM lines
+$$ LANGUAGE sql STABLE;
+
+-- Landed cost totals of one unit, as a one-row table function so callers get
+-- it inlined. NULL when a line has no rate to convert at (no rates at all)
+CREATE OR REPLACE FUNCTION landed_cost_totals(unit inventory)
+RETURNS TABLE (total_cost_usd DECIMAL, total_cost_mxn DECIMAL) AS $$
+    SELECT CASE WHEN count(*) = count(exchange_rate) THEN COALESCE(sum(amount_usd), 0) END,
+           CASE WHEN count(*) = count(exchange_rate) THEN COALESCE(sum(amount_mxn), 0) END
+    FROM landed_cost_lines(unit)
+$$ LANGUAGE sql STABLE;
+
+-- Rewrite the cached totals of these units where they changed; returns the
+-- count. Correlated subqueries rather than a join: the triggers run this
+-- right after bulk loads, before the tables have statistics, when the planner
+-- would happily nested-loop the whole id list against itself
+CREATE OR REPLACE FUNCTION refresh_landed_costs(ids INTEGER[])
+RETURNS INTEGER AS $$
+    WITH updated AS (
+        UPDATE inventory i
+        SET (total_cost_usd, total_cost_mxn) = (SELECT * FROM landed_cost_totals(i))
+        WHERE i.inventory_id = ANY(ids)
+          AND NOT EXISTS (
+              SELECT 1 FROM landed_cost_totals(i) t
+              WHERE (t.total_cost_usd, t.total_cost_mxn) IS NOT DISTINCT FROM (i.total_cost_usd, i.total_cost_mxn)
+          )
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM updated
+$$ LANGUAGE sql;
+
+-- Recompute totals when a unit's own cost columns change; profit follows the
+-- totals and the sale price (sale_price itself when sold in that currency)
+CREATE OR REPLACE FUNCTION compute_landed_cost()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR ROW(
+        NEW.purchase_date, NEW.purchase_price_usd, NEW.transport_to_stock_cost_usd,
+        NEW.initial_reconditioning_cost_usd, NEW.other_acquisition_costs_usd, NEW.sale_date,
+        NEW.import_started_date, NEW.import_completed_date, NEW.import_cost_mxn, NEW.customs_cost_mxn,
+        NEW.regulatory_cost_mxn, NEW.other_import_costs_mxn, NEW.preventive_maintenance_cost,
+        NEW.preventive_maintenance_currency, NEW.preventive_maintenance_date,
+        NEW.transport_to_client_cost_mxn, NEW.delivery_date, NEW.other_costs_after_sale,
+        NEW.other_costs_currency
+    ) IS DISTINCT FROM ROW(
+        OLD.purchase_date, OLD.purchase_price_usd, OLD.transport_to_stock_cost_usd,
+        OLD.initial_reconditioning_cost_usd, OLD.other_acquisition_costs_usd, OLD.sale_date,
+        OLD.import_started_date, OLD.import_completed_date, OLD.import_cost_mxn, OLD.customs_cost_mxn,
+        OLD.regulatory_cost_mxn, OLD.other_import_costs_mxn, OLD.preventive_maintenance_cost,
+        OLD.preventive_maintenance_currency, OLD.preventive_maintenance_date,
+        OLD.transport_to_client_cost_mxn, OLD.delivery_date, OLD.other_costs_after_sale,
+        OLD.other_costs_currency
+    ) THEN
+        SELECT t.total_cost_usd, t.total_cost_mxn INTO NEW.total_cost_usd, NEW.total_cost_mxn
+        FROM landed_cost_totals(NEW) t;
+    END IF;
+    NEW.profit_usd = COALESCE(NEW.sale_price_usd, CASE WHEN NEW.sale_currency = 'USD' THEN NEW.sale_price END)
+        - NEW.total_cost_usd;
+    NEW.profit_mxn = COALESCE(NEW.sale_price_mxn, CASE WHEN NEW.sale_currency = 'MXN' THEN NEW.sale_price END)
+        - NEW.total_cost_mxn;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+-- Named to run after auto_update_is_sold, which can set sale_date
+CREATE TRIGGER landed_cost_totals BEFORE INSERT OR UPDATE ON inventory
+    FOR EACH ROW EXECUTE FUNCTION compute_landed_cost();
+
+-- Cost items and work plans refresh their units once per statement
+CREATE OR REPLACE FUNCTION landed_cost_sources_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_landed_costs(ARRAY(SELECT DISTINCT inventory_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_landed_costs(ARRAY(SELECT DISTINCT inventory_id FROM old_rows));
+    ELSE
+        PERFORM refresh_landed_costs(ARRAY(
+            SELECT inventory_id FROM new_rows UNION SELECT inventory_id FROM old_rows
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER cost_items_landed_cost_insert AFTER INSERT ON cost_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION landed_cost_sources_changed();
+
+CREATE TRIGGER cost_items_landed_cost_update AFTER UPDATE ON cost_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION landed_cost_sources_changed();
+
+CREATE TRIGGER cost_items_landed_cost_delete AFTER DELETE ON cost_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION landed_cost_sources_changed();
+
+CREATE TRIGGER work_plans_landed_cost_insert AFTER INSERT ON work_plans
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION landed_cost_sources_changed();
+
+CREATE TRIGGER work_plans_landed_cost_update AFTER UPDATE ON work_plans
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION landed_cost_sources_changed();
+
+CREATE TRIGGER work_plans_landed_cost_delete AFTER DELETE ON work_plans
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION landed_cost_sources_changed();
+
+-- Exchange rates are not watched: a new or corrected rate changes the totals
+-- of every unit with costs on or after its date. Run recompute_landed_costs.py
+-- after back-dating or correcting one.
+
+-- Record today's inventory in inventory_snapshots (run daily by
+-- snapshot_inventory.py). Re-running on the same day replaces that day's rows.
+-- Returns the number of rows written.
+CREATE OR REPLACE FUNCTION take_inventory_snapshot()
+RETURNS INTEGER AS $$
+DECLARE
+    partition_name TEXT := format('inventory_snapshots_%s', extract(year FROM CURRENT_DATE));
+    written INTEGER;
+BEGIN
+    -- Serialises concurrent runs, including their partition creation
+    PERFORM pg_advisory_xact_lock(hashtext('take_inventory_snapshot'));
+
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF inventory_snapshots FOR VALUES FROM (%L) TO (%L)',
+            partition_name, date_trunc('year', CURRENT_DATE)::DATE,
+            (date_trunc('year', CURRENT_DATE) + INTERVAL '1 year')::DATE
+        );
+    END IF;
+
+    DELETE FROM inventory_snapshots WHERE snapshot_date = CURRENT_DATE;
+
+    INSERT INTO inventory_snapshots (
+        snapshot_date, current_location, status, is_sold,
+        units, us_stock_cost_usd, landed_cost_usd, age_day_sum
+    )
+    SELECT CURRENT_DATE, COALESCE(current_location, 'Unknown'), status, COALESCE(is_sold, FALSE),
+           COUNT(*), COALESCE(SUM(cost_in_us_stock_usd), 0), COALESCE(SUM(total_cost_usd), 0),
+           SUM(CURRENT_DATE - purchase_date)
+    FROM inventory
+    WHERE is_deleted = FALSE
+    GROUP BY 2, 3, 4;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ language 'plpgsql';
+
+-- Stage durations. Statuses group into pipeline stages; Delivered ends the
+-- pipeline and has no stage.
+CREATE OR REPLACE FUNCTION pipeline_stage(status TEXT)
+RETURNS VARCHAR AS $$
+    SELECT (CASE status
+        WHEN 'Purchased - In Transit to Stock' THEN 'In Transit'
+        WHEN 'In Stock (US)' THEN 'US Stock'
+        WHEN 'Sold - Pending Import' THEN 'US Stock'
+        WHEN 'Import/Customs Processing' THEN 'Import/Customs'
+        WHEN 'In Stock (Mexico)' THEN 'Mexico Stock'
+        WHEN 'In Preventive Maintenance' THEN 'Mexico Stock'
+        WHEN 'Ready for Delivery' THEN 'Mexico Stock'
+        WHEN 'In Transit to Client' THEN 'Delivery'
+        WHEN 'Delivered' THEN NULL
+        ELSE 'Other'
+    END)::VARCHAR
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Rebuild the intervals and stock day counts of every queued unit; returns
+-- the number of units rebuilt. Each history row starts an interval that the
+-- next one ends. A unit's first status, when no history row records entering
+-- it (units are created with a status), counts from its purchase date.
+CREATE OR REPLACE FUNCTION refresh_stage_intervals()
+RETURNS INTEGER AS $$
+DECLARE
+    ids INTEGER[];
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_stage_intervals'));
+
+    WITH taken AS (DELETE FROM stage_intervals_pending RETURNING inventory_id)
+    SELECT array_agg(inventory_id) INTO ids FROM taken;
+
+    IF ids IS NOT NULL THEN
+        -- EXECUTE so a handful of units and a bulk load each get their own plan
+        EXECUTE 'DELETE FROM inventory_stage_intervals WHERE inventory_id = ANY($1)' USING ids;
+        EXECUTE $q$
+            INSERT INTO inventory_stage_intervals (inventory_id, seq, status, stage, entered_at, left_at)
+            SELECT inventory_id, seq, status, pipeline_stage(status), entered_at, left_at
+            FROM (
+                SELECT t.inventory_id, t.status, t.entered_at,
+                       row_number() OVER w AS seq,
+                       lead(t.entered_at) OVER w AS left_at
+                FROM (
+                    SELECT h.inventory_id, h.new_status AS status, h.changed_at AS entered_at, h.history_id
+                    FROM inventory_status_history h
+                    WHERE h.inventory_id = ANY($1)
+                    UNION ALL
+                    SELECT i.inventory_id, COALESCE(f.old_status, i.status),
+                           LEAST(i.purchase_date::TIMESTAMP, f.changed_at), 0
+                    FROM inventory i
+                    LEFT JOIN LATERAL (
+                        SELECT h.old_status, h.changed_at, h.history_id
+                        FROM inventory_status_history h
+                        WHERE h.inventory_id = i.inventory_id
+                        ORDER BY h.changed_at, h.history_id
+                        LIMIT 1
+                    ) f ON TRUE
+                    WHERE i.inventory_id = ANY($1) AND (f.history_id IS NULL OR f.old_status IS NOT NULL)
+                ) t
+                WINDOW w AS (PARTITION BY t.inventory_id ORDER BY t.entered_at, t.history_id)
+            ) timeline
+            WHERE pipeline_stage(status) IS NOT NULL AND entered_at IS NOT NULL
+        $q$ USING ids;
+        EXECUTE 'DELETE FROM inventory_stock_days WHERE inventory_id = ANY($1)' USING ids;
+        EXECUTE $q$
+            INSERT INTO inventory_stock_days (
+                inventory_id, us_stock_days, us_stock_since, mexico_stock_days, mexico_stock_since
+            )
+            SELECT inventory_id,
+                   sum(COALESCE(left_at::DATE - entered_at::DATE, 0)) FILTER (WHERE stage = 'US Stock'),
+                   max(entered_at::DATE) FILTER (WHERE stage = 'US Stock' AND left_at IS NULL),
+                   sum(COALESCE(left_at::DATE - entered_at::DATE, 0)) FILTER (WHERE stage = 'Mexico Stock'),
+                   max(entered_at::DATE) FILTER (WHERE stage = 'Mexico Stock' AND left_at IS NULL)
+            FROM inventory_stage_intervals
+            WHERE inventory_id = ANY($1) AND stage IN ('US Stock', 'Mexico Stock')
+            GROUP BY inventory_id
+        $q$ USING ids;
+        UPDATE stage_intervals_state SET generation = generation + 1;
+    END IF;
+
+    RETURN COALESCE(cardinality(ids), 0);
+END;
+$$ language 'plpgsql';
+
+-- Queue units whose status history changed, and new units (their first status
+-- counts from the purchase date even before any history exists)
+CREATE OR REPLACE FUNCTION queue_stage_intervals()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO stage_intervals_pending
+        SELECT DISTINCT inventory_id FROM new_rows WHERE inventory_id IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO stage_intervals_pending
+        SELECT DISTINCT inventory_id FROM old_rows WHERE inventory_id IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    ELSE
+        INSERT INTO stage_intervals_pending
+        SELECT inventory_id FROM new_rows WHERE inventory_id IS NOT NULL
+        UNION SELECT inventory_id FROM old_rows WHERE inventory_id IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER inventory_stage_intervals_insert AFTER INSERT ON inventory
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION queue_stage_intervals();
+
+CREATE TRIGGER status_history_stage_intervals_insert AFTER INSERT ON inventory_status_history
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION queue_stage_intervals();
+
+CREATE TRIGGER status_history_stage_intervals_update AFTER UPDATE ON inventory_status_history
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION queue_stage_intervals();
+
+CREATE TRIGGER status_history_stage_intervals_delete AFTER DELETE ON inventory_status_history
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION queue_stage_intervals();
+
 -- Sample Data
 INSERT INTO exchange_rates (from_currency, to_currency, rate, effective_date) VALUES
 ('USD', 'MXN', 17.50, CURRENT_DATE);
@@ -528,32 +1184,38 @@ INSERT INTO suppliers (company_name, contact_person, email, phone, supplier_type
 
 -- Views
 CREATE VIEW current_exchange_rate AS
-SELECT rate_id, from_currency, to_currency, rate, effective_date
+SELECT rate_id, from_currency, to_currency, rate, effective_date, created_at, is_active
 FROM exchange_rates
 WHERE is_active = TRUE
-ORDER BY effective_date DESC
+ORDER BY effective_date DESC, rate_id DESC
 LIMIT 1;
 
+-- Inventory report views carry the unit's inventory_stock_days columns, which
+-- the API turns into days_in_us_stock / days_in_mexico_stock
 CREATE VIEW us_inventory AS
-SELECT *
-FROM inventory
-WHERE current_location = 'US Stock' AND is_deleted = FALSE
-ORDER BY purchase_date DESC;
+SELECT i.*, sd.us_stock_days, sd.us_stock_since, sd.mexico_stock_days, sd.mexico_stock_since
+FROM inventory i
+LEFT JOIN inventory_stock_days sd ON sd.inventory_id = i.inventory_id
+WHERE i.current_location = 'US Stock' AND i.is_deleted = FALSE
+ORDER BY i.purchase_date DESC;
 
 CREATE VIEW mexico_inventory AS
-SELECT *
-FROM inventory
-WHERE current_location = 'Mexico Stock' AND is_deleted = FALSE
-ORDER BY purchase_date DESC;
+SELECT i.*, sd.us_stock_days, sd.us_stock_since, sd.mexico_stock_days, sd.mexico_stock_since
+FROM inventory i
+LEFT JOIN inventory_stock_days sd ON sd.inventory_id = i.inventory_id
+WHERE i.current_location = 'Mexico Stock' AND i.is_deleted = FALSE
+ORDER BY i.purchase_date DESC;
 
 CREATE VIEW sold_pending_delivery AS
-SELECT *
-FROM inventory
-WHERE is_sold = TRUE AND status != 'Delivered' AND is_deleted = FALSE
-ORDER BY sale_date;
+SELECT i.*, sd.us_stock_days, sd.us_stock_since, sd.mexico_stock_days, sd.mexico_stock_since
+FROM inventory i
+LEFT JOIN inventory_stock_days sd ON sd.inventory_id = i.inventory_id
+WHERE i.is_sold = TRUE AND i.status != 'Delivered' AND i.is_deleted = FALSE
+ORDER BY i.sale_date;
 
 CREATE VIEW units_under_warranty AS
-SELECT *
-FROM inventory
-WHERE warranty_status = 'Active' AND warranty_end_date >= CURRENT_DATE
-ORDER BY warranty_end_date;
+SELECT i.*, sd.us_stock_days, sd.us_stock_since, sd.mexico_stock_days, sd.mexico_stock_since
+FROM inventory i
+LEFT JOIN inventory_stock_days sd ON sd.inventory_id = i.inventory_id
+WHERE i.warranty_status = 'Active' AND i.warranty_end_date >= CURRENT_DATE AND i.is_deleted = FALSE
+ORDER BY i.warranty_end_date;
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Buses America - Query Plan Regression Check
+Loads the schema into a scratch Postgres schema, seeds a 100k-unit fleet and
+asserts every inventory listing / report query is served by an index, not a
+sequential scan over inventory. Queries are built from the API's own SELECT
+lists, and most cases name the index they must use, so a plan that drifts to
+a worse index fails too.
+
+Usage:
+    DATABASE_URL=postgresql://... python check_query_plans.py [--rows 100000] [--keep]
+
+The dashboard must stay a single-row read of dashboard_summary by its primary
+key, never touching inventory. pg_trgm (Postgres contrib) is required: the
+schema's trigram indexes need it, and the check creates it if missing.
+
+Run it against a development database: everything is created inside the
+`plan_check` schema, which is dropped again at the end (unless --keep).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import date, datetime
+
+import asyncpg
+
+import backend_api_FINAL as api
+
+CHECK_SCHEMA = "plan_check"
+
+# Tables that must never be sequentially scanned by an endpoint query
+WATCHED_TABLES = {"inventory", "exchange_rates"}
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+# Realistic mix: most of the fleet is delivered history, a few percent is live stock
+SEED_SQL = """
+INSERT INTO suppliers (company_name, supplier_type)
+SELECT 'Supplier ' || g, 'Auction' FROM generate_series(1, 50) g;
+
+INSERT INTO exchange_rates (from_currency, to_currency, rate, effective_date)
+SELECT 'USD', 'MXN', 17 + (g % 100) / 100.0, CURRENT_DATE - g
+FROM generate_series(1, 2000) g;
+
+INSERT INTO inventory (
+    stock_number, vin, year, make, model, purchase_date, purchase_price_usd,
+    supplier_id, status, current_location, is_sold, sale_date,
+    delivery_date, warranty_status, warranty_start_date, warranty_end_date,
+    is_deleted, created_at
+)
+SELECT
+    'BA-' || g,
+    'VIN' || lpad(g::text, 14, '0'),
+    2005 + g % 18,
+    (ARRAY['Blue Bird', 'Thomas Built', 'IC Bus', 'Freightliner', 'International'])[1 + g % 5],
+    'Model ' || g % 20,
+    CURRENT_DATE - (g % 1800),
+    15000 + g % 40000,
+    1 + g % 53,
+    CASE
+        WHEN g % 100 < 3 THEN 'In Stock (US)'
+        WHEN g % 100 < 5 THEN 'In Stock (Mexico)'
+        WHEN g % 100 < 7 THEN 'Import/Customs Processing'
+        WHEN g % 100 = 7 THEN 'Purchased - In Transit to Stock'
+        ELSE 'Delivered'
+    END,
+    CASE
+        WHEN g % 100 < 3 THEN 'US Stock'
+        WHEN g % 100 < 5 THEN 'Mexico Stock'
+        WHEN g % 100 < 8 THEN 'In Transit'
+        ELSE 'Client'
+    END,
+    g % 100 >= 5 AND g % 100 != 7,
+    CASE WHEN g % 100 >= 5 AND g % 100 != 7 THEN CURRENT_DATE - (g % 1500) END,
+    CASE WHEN g % 100 >= 8 THEN CURRENT_DATE - (g % 1400) END,
+    CASE WHEN g % 100 = 8 THEN 'Active' WHEN g % 100 > 8 THEN 'Expired' END,
+    CASE WHEN g % 100 >= 8 THEN CURRENT_DATE - (g % 1400) END,
+    CASE WHEN g % 100 = 8 THEN CURRENT_DATE + (g % 60) WHEN g % 100 > 8 THEN CURRENT_DATE - (g % 1400) END,
+    g % 50 = 49,
+    TIMESTAMP '2020-01-01' + g * INTERVAL '20 minutes'
+FROM generate_series(1, $1::int) g;
+
+-- A rare make so the trigram index is the cheapest way to answer make ILIKE
+UPDATE inventory SET make = 'Collins' WHERE inventory_id % 1000 = 0;
+
+-- Each unit's creation status becomes its first stage interval
+SELECT refresh_stage_intervals();
+
+ANALYZE;
+"""
+
+# The API's own SELECT lists, so plans match what it sends (e.g. whether an
+# index-only scan is possible)
+LIST_COLUMNS = f"SELECT {api.INVENTORY_SELECT} FROM {api.INVENTORY_FROM}"
+SUMMARY_COLUMNS = (
+    f"SELECT {api.column_list(api.INVENTORY_SUMMARY_COLUMNS)}, {api.PRIMARY_THUMBNAIL_SQL} FROM inventory"
+)
+LIST_ORDER = "ORDER BY created_at DESC, inventory_id DESC"
+
+# (name, query, params, index the plan must use or None for any index)
+# mirroring the SQL issued by backend_api_FINAL.py
+CASES = [
+    ("GET /api/inventory",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE {LIST_ORDER} LIMIT $1 OFFSET $2", [100, 0],
+     "idx_inventory_created_at_id"),
+    ("GET /api/inventory?fields=summary",
+     f"{SUMMARY_COLUMNS} WHERE is_deleted = FALSE {LIST_ORDER} LIMIT $1 OFFSET $2", [100, 0],
+     "idx_inventory_created_at_id"),
+    ("GET /api/inventory (deep offset)",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE {LIST_ORDER} LIMIT $1 OFFSET $2", [100, 20000],
+     "idx_inventory_created_at_id"),
+    ("GET /api/inventory (cursor)",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE AND (created_at, inventory_id) < ($1, $2) "
+     f"{LIST_ORDER} LIMIT $3", [datetime(2022, 1, 1), 50000, 101],
+     "idx_inventory_created_at_id"),
+    ("GET /api/inventory?status=",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE AND status = $1 {LIST_ORDER} LIMIT $2 OFFSET $3",
+     ["In Stock (US)", 100, 0], "idx_inventory_status_created"),
+    ("GET /api/inventory?current_location=",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE AND current_location = $1 {LIST_ORDER} LIMIT $2 OFFSET $3",
+     ["Mexico Stock", 100, 0], "idx_inventory_location_created"),
+    ("GET /api/inventory?is_sold=",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE AND is_sold = $1 {LIST_ORDER} LIMIT $2 OFFSET $3",
+     [False, 100, 0], "idx_inventory_sold_created"),
+    ("GET /api/inventory?supplier_id=",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE AND supplier_id = $1 {LIST_ORDER} LIMIT $2 OFFSET $3",
+     [7, 100, 0], "idx_inventory_supplier_created"),
+    ("GET /api/inventory?make=",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE AND make ILIKE $1 {LIST_ORDER} LIMIT $2 OFFSET $3",
+     ["%collins%", 100, 0], "idx_inventory_make_trgm"),
+    ("GET /api/inventory?current_location=&is_sold=",
+     f"{LIST_COLUMNS} WHERE is_deleted = FALSE AND current_location = $1 AND is_sold = $2 "
+     f"{LIST_ORDER} LIMIT $3 OFFSET $4", ["US Stock", False, 100, 0], "idx_inventory_location_created"),
+    ("GET /api/inventory/{id}", api.INVENTORY_ITEM_SQL, [12345], "inventory_pkey"),
+    ("GET /api/inventory/{id}/costs",
+     "SELECT l.* FROM inventory i CROSS JOIN LATERAL landed_cost_lines(i) l WHERE i.inventory_id = $1 "
+     "ORDER BY l.date_incurred, l.cost_category, l.source, l.source_id", [12345], None),
+    ("GET /api/reports/profitability?date_from=&date_to=",
+     *api.profitability_query([], date(2023, 1, 1), date(2023, 1, 31), "USD", False),
+     "idx_inventory_sale_date"),
+    ("GET /api/reports/profitability?group_by=month,supplier&date_from=&date_to=",
+     *api.profitability_query(["month", "supplier"], date(2023, 1, 1), date(2023, 3, 31), "USD", False),
+     "idx_inventory_sale_date"),
+    ("GET /api/inventory/{id}/stages", api.STAGE_INTERVALS_SQL, [500], "inventory_stage_intervals_pkey"),
+    ("GET /api/exchange-rates/current", "SELECT * FROM current_exchange_rate", [], "idx_exchange_rate_active"),
+]
+
+# (name, query, table) for endpoints that must read exactly one row of a
+# summary table by its key, and nothing else
+SINGLE_ROW_CASES = [
+    ("GET /api/reports/dashboard", api.DASHBOARD_SQL, "dashboard_summary"),
+]
+
+# (name, view, index) for the report endpoints, which select the view's
+# columns as the API lists them once the schema is loaded
+REPORT_CASES = [
+    ("GET /api/reports/us-inventory", "us_inventory", "idx_inventory_location_purchase"),
+    ("GET /api/reports/mexico-inventory", "mexico_inventory", "idx_inventory_location_purchase"),
+    ("GET /api/reports/sold-pending", "sold_pending_delivery", "idx_inventory_sold_pending"),
+    ("GET /api/reports/warranty-active", "units_under_warranty", "idx_inventory_warranty_active"),
+]
+
+def walk_plan(node):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan tree"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+def check_plan(plan, expected_index=None):
+    """Return (ok, summary) for a single plan"""
+    nodes = list(walk_plan(plan))
+    seq_scans = [
+        n["Relation Name"] for n in nodes
+        if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in WATCHED_TABLES
+    ]
+    indexes = [n["Index Name"] for n in nodes if n["Node Type"] in INDEX_NODES]
+    if seq_scans:
+        return False, f"Seq Scan on {', '.join(seq_scans)}"
+    if not indexes:
+        return False, "no index used"
+    used = ", ".join(dict.fromkeys(indexes))
+    if expected_index and expected_index not in indexes:
+        return False, f"expected {expected_index}, used {used}"
+    return True, used
+
+def check_single_row(plan, table):
+    """Return (ok, summary) for a plan that must read one row of ``table`` by its key.
+
+    On a one-page table Postgres rightly prefers a Seq Scan to the primary key
+    index, so either is accepted as long as the key condition is applied and
+    no other relation is read.
+    """
+    nodes = list(walk_plan(plan))
+    relations = {n["Relation Name"] for n in nodes if "Relation Name" in n}
+    if relations != {table}:
+        return False, f"reads {', '.join(sorted(relations)) or 'nothing'}"
+    scan = next(n for n in nodes if n.get("Relation Name") == table)
+    condition = scan.get("Index Cond") or scan.get("Filter") or ""
+    if "summary_id = 1" not in condition:
+        return False, f"{scan['Node Type']} on {table} without the key condition"
+    if plan["Plan Rows"] != 1:
+        return False, f"estimated {plan['Plan Rows']} rows"
+    return True, f"{scan.get('Index Name') or scan['Node Type']} on {table}, 1 row"
+
+async def run_checks(database_url, schema_file, rows, keep):
+    conn = await asyncpg.connect(database_url)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {CHECK_SCHEMA}")
+        await conn.execute(f"SET search_path TO {CHECK_SCHEMA}, public")
+
+        # Installed into the scratch schema (and dropped with it) unless the
+        # database already has it
+        try:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except asyncpg.PostgresError as e:
+            print(f"✗ pg_trgm is not available ({e}); install the Postgres contrib package")
+            sys.exit(1)
+
+        print(f"Loading schema from {schema_file}...")
+        with open(schema_file, 'r') as f:
+            await conn.execute(f.read())
+
+        print(f"Seeding {rows:,} inventory rows...")
+        for statement in SEED_SQL.split(';\n'):
+            if statement.strip():
+                if '$1' in statement:
+                    await conn.execute(statement, rows)
+                else:
+                    await conn.execute(statement)
+
+        cases = list(CASES)
+        for name, view, expected_index in REPORT_CASES:
+            columns = await api.get_relation_columns(conn, view)
+            cases.append((name, f"SELECT {api.column_list(columns)} FROM {view}", [], expected_index))
+
+        print()
+        failures = 0
+        for name, query, params, expected_index in cases:
+            explain = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *params)
+            plan = json.loads(explain)[0]["Plan"]
+            ok, summary = check_plan(plan, expected_index)
+            if not ok:
+                failures += 1
+            print(f"  {'✓' if ok else '✗'} {name:<48} {summary}")
+
+        for name, query, table in SINGLE_ROW_CASES:
+            explain = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}")
+            ok, summary = check_single_row(json.loads(explain)[0]["Plan"], table)
+            if not ok:
+                failures += 1
+            print(f"  {'✓' if ok else '✗'} {name:<48} {summary}")
+
+        return failures
+    finally:
+        if not keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE")
+        await conn.close()
+
+TOTAL_CASES = len(CASES) + len(REPORT_CASES) + len(SINGLE_ROW_CASES)
+
+def main():
+    parser = argparse.ArgumentParser(description="Assert endpoint queries use indexes")
+    parser.add_argument("--rows", type=int, default=100_000, help="inventory rows to seed")
+    parser.add_argument("--schema-file", default="bus_inventory_schema_FINAL.sql")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {CHECK_SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    print("=" * 50)
+    print("Buses America - Query Plan Check")
+    print("=" * 50)
+
+    failures = asyncio.run(run_checks(database_url, args.schema_file, args.rows, args.keep))
+
+    print("\n" + "=" * 50)
+    if failures:
+        print(f"✗ {failures} of {TOTAL_CASES} queries are not served by their index")
+        print("=" * 50)
+        sys.exit(1)
+    print(f"✓ All {TOTAL_CASES} queries use their index")
+    print("=" * 50)
+
+if __name__ == "__main__":
+    main()
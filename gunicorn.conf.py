@@ -0,0 +1,81 @@
+"""
+Buses America - Gunicorn Configuration
+Production entry point: one gunicorn master supervising several uvicorn
+worker processes, so a CPU-heavy request only holds up its own worker.
+
+Usage:
+    gunicorn -c gunicorn.conf.py backend_api_FINAL:app
+
+Workers come from WEB_CONCURRENCY, else one per CPU core. Every worker runs
+the app's lifespan and so opens its own asyncpg pool plus one LISTEN
+connection; the service-wide DB_CONNECTION_BUDGET is divided between them here,
+once, in the master, and handed to the workers through the environment. An
+explicit DB_POOL_MAX_SIZE / DB_POOL_MIN_SIZE / PHOTO_WORKERS still wins.
+Workers are capped so every one gets a pool of at least 2 within the budget;
+a budget (or explicit pool size) that cannot fit stops the server at startup.
+
+Graceful reload: `kill -HUP <master pid>` starts workers on the current code
+and config and gives the old ones graceful_timeout seconds to finish in-flight
+requests (with GUNICORN_PRELOAD=1 the code is not re-imported on HUP).
+
+Metrics, pool stats and the slow-query log settings are per worker.
+"""
+
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+requested_workers = int(os.getenv("WEB_CONCURRENCY") or cpu_count)
+
+# Total Postgres connections this service may hold, across all workers
+db_connection_budget = int(os.getenv("DB_CONNECTION_BUDGET", "20"))
+# Smallest useful pool per worker; each worker also holds the exchange-rate
+# LISTEN connection. Run fewer workers rather than go over the budget.
+min_pool_size = 2
+workers = min(requested_workers, db_connection_budget // (min_pool_size + 1))
+if workers < 1:
+    raise RuntimeError(
+        f"DB_CONNECTION_BUDGET={db_connection_budget} is too small for one worker "
+        f"(pool of {min_pool_size} + 1 listener)"
+    )
+pool_max_size = db_connection_budget // workers - 1
+os.environ.setdefault("DB_POOL_MAX_SIZE", str(pool_max_size))
+os.environ.setdefault("DB_POOL_MIN_SIZE", str(min(2, pool_max_size)))
+
+# An explicit DB_POOL_MAX_SIZE must fit too
+connection_total = workers * (int(os.environ["DB_POOL_MAX_SIZE"]) + 1)
+if connection_total > db_connection_budget:
+    raise RuntimeError(
+        f"{workers} worker(s) x (pool of {os.environ['DB_POOL_MAX_SIZE']} + 1 listener) = "
+        f"{connection_total} connections exceeds DB_CONNECTION_BUDGET={db_connection_budget}; "
+        "lower WEB_CONCURRENCY or DB_POOL_MAX_SIZE, or raise the budget"
+    )
+# Pillow processes per worker, so all workers together use about one per core
+os.environ.setdefault("PHOTO_WORKERS", str(max(1, cpu_count // workers)))
+
+# Streamed reports and bulk imports can legitimately take a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Recycle workers after this many requests (0 = never)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+# Import the app once in the master and fork it (shared memory, faster start)
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+def on_starting(server):
+    if workers < requested_workers:
+        server.log.warning(
+            "Running %d of %d requested worker(s): DB_CONNECTION_BUDGET %d allows no more",
+            workers, requested_workers, db_connection_budget,
+        )
+    server.log.info(
+        "%d worker(s) x (pool of %s + 1 listener) = %d connection(s), budget %d",
+        workers, os.environ["DB_POOL_MAX_SIZE"], connection_total, db_connection_budget,
+    )
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Buses America - Database Initialization Script
-Runs automatically on first deployment to setup database schema
+Runs before every start (see render.yaml): loads the schema into an empty
+database, and upgrades an existing one to it (upgrade_database.py)
 """
 
 import os
@@ -9,6 +10,8 @@ import sys
 import asyncpg
 import asyncio
 
+from upgrade_database import record_schema_hash, schema_statements, upgrade
+
 async def init_database():
     """Initialize database with schema"""
     
@@ -31,14 +34,19 @@ async def init_database():
             "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'inventory'"
         )
         
+        await conn.close()
+        
         if result > 0:
             print("✓ Database already initialized!")
-            print("✓ Tables exist, skipping initialization")
-            await conn.close()
+            print("Upgrading to the current schema...")
+            try:
+                await upgrade(database_url, 'bus_inventory_schema_FINAL.sql')
+            except Exception as e:
+                print(f"✗ Error upgrading schema: {e}")
+                return False
+            print("✓ Schema upgraded")
             return True
         
-        await conn.close()
-        
     except Exception as e:
         print(f"Checking database: {e}")
     
@@ -53,19 +61,14 @@ async def init_database():
         # Connect and execute
         conn = await asyncpg.connect(database_url)
         
-        # Split by statement and execute
-        statements = [s.strip() for s in schema_sql.split(';') if s.strip()]
-        
-        for i, statement in enumerate(statements):
-            try:
-                await conn.execute(statement)
-                if i % 10 == 0:
-                    print(f"  Executed {i+1}/{len(statements)} statements...")
-            except Exception as e:
-                if "already exists" not in str(e):
-                    print(f"  Warning: {e}")
-        
-        await conn.close()
+        # Execute as one script: splitting on ';' would cut the trigger
+        # function bodies ($$ ... $$) apart
+        try:
+            await conn.execute(schema_sql)
+            # Lets the next start skip the upgrade replay
+            await record_schema_hash(conn, schema_statements(schema_sql))
+        finally:
+            await conn.close()
         
         print("✓ Database schema loaded successfully!")
         print("✓ All tables, indexes, and triggers created")
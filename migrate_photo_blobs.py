@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Buses America - Photo Blob Migration
+Moves photos uploaded before content-addressed storage into the blob store:
+hashes each file, copies it to {UPLOAD_DIR}/blobs/.., renders missing
+variants and records content_hash / paths on the inventory_photos row.
+Rows that turn out to be the same image twice for one unit are merged.
+
+Usage:
+    DATABASE_URL=postgresql://... UPLOAD_DIR=/tmp/uploads \\
+        python migrate_photo_blobs.py [--dry-run] [--remove-originals]
+
+Safe to re-run: only rows without a content_hash are touched.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+import asyncpg
+
+import photo_processing
+
+def legacy_variant_paths(file_path):
+    """Variant files the pre-blob upload handler wrote next to the original"""
+    stem = os.path.splitext(file_path)[0]
+    return [f"{stem}.web.jpg", f"{stem}.thumb.jpg"]
+
+async def migrate(database_url, store_root, dry_run, remove_originals):
+    conn = await asyncpg.connect(database_url)
+    stats = {"migrated": 0, "merged": 0, "missing": 0, "not_image": 0, "removed_files": 0}
+    try:
+        rows = await conn.fetch("""
+            SELECT photo_id, inventory_id, file_path, is_primary
+            FROM inventory_photos
+            WHERE content_hash IS NULL
+            ORDER BY photo_id
+        """)
+        print(f"{len(rows)} photo(s) without a content hash\n")
+
+        for row in rows:
+            old_path = row["file_path"]
+            if not os.path.exists(old_path):
+                stats["missing"] += 1
+                print(f"  ✗ photo {row['photo_id']}: file missing ({old_path})")
+                continue
+
+            if dry_run:
+                digest = photo_processing.hash_file(old_path)
+                print(f"  • photo {row['photo_id']}: {digest[:12]}…  {old_path}")
+                continue
+
+            with open(old_path, "rb") as f:
+                stored = photo_processing.store_upload(f, store_root)
+            digest = stored["content_hash"]
+            variant_paths = photo_processing.variant_paths_for(store_root, digest)
+            try:
+                dimensions = photo_processing.make_variants(stored["path"], variant_paths)
+            except photo_processing.ImageDecodeError:
+                dimensions = {"width": None, "height": None}
+                variant_paths = {"web": None, "thumbnail": None}
+                stats["not_image"] += 1
+
+            async with conn.transaction():
+                keeper = await conn.fetchrow(
+                    "SELECT photo_id FROM inventory_photos WHERE inventory_id = $1 AND content_hash = $2",
+                    row["inventory_id"], digest
+                )
+                if keeper:
+                    # Same image already stored for this unit: fold this row into it
+                    if row["is_primary"]:
+                        await conn.execute(
+                            "UPDATE inventory_photos SET is_primary = TRUE WHERE photo_id = $1",
+                            keeper["photo_id"]
+                        )
+                    await conn.execute("DELETE FROM inventory_photos WHERE photo_id = $1", row["photo_id"])
+                    stats["merged"] += 1
+                    print(f"  ↳ photo {row['photo_id']}: duplicate of photo {keeper['photo_id']}, merged")
+                else:
+                    await conn.execute("""
+                        UPDATE inventory_photos
+                        SET content_hash = $2, file_path = $3, file_size = $4,
+                            web_path = $5, thumbnail_path = $6, width = $7, height = $8
+                        WHERE photo_id = $1
+                    """, row["photo_id"], digest, stored["path"], stored["size"],
+                        variant_paths["web"], variant_paths["thumbnail"],
+                        dimensions["width"], dimensions["height"])
+                    stats["migrated"] += 1
+                    print(f"  ✓ photo {row['photo_id']}: {digest[:12]}…")
+
+            if remove_originals:
+                still_used = await conn.fetchval(
+                    "SELECT COUNT(*) FROM inventory_photos WHERE file_path = $1", old_path
+                )
+                if not still_used:
+                    for path in [old_path, *legacy_variant_paths(old_path)]:
+                        if os.path.exists(path):
+                            os.remove(path)
+                            stats["removed_files"] += 1
+    finally:
+        await conn.close()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Rehash existing photos into the blob store")
+    parser.add_argument("--dry-run", action="store_true", help="hash and report, change nothing")
+    parser.add_argument("--remove-originals", action="store_true",
+                        help="delete the old files once no row points at them")
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+    store_root = os.path.join(os.getenv("UPLOAD_DIR", "./uploads"), "blobs")
+
+    print("=" * 50)
+    print("Buses America - Photo Blob Migration")
+    print("=" * 50)
+
+    stats = asyncio.run(migrate(database_url, store_root, args.dry_run, args.remove_originals))
+
+    print("\n" + "=" * 50)
+    for key, value in stats.items():
+        print(f"  {key.replace('_', ' '):<16} {value}")
+    print("=" * 50)
+    if stats["missing"]:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Buses America - Photo Processing
+Content-addressed storage and Pillow work for uploaded inventory photos. The API
+runs these functions on threads / in a worker process pool so hashing and
+resizing never block the event loop; keep this module free of FastAPI/asyncpg
+imports so workers start quickly.
+
+Blobs live at {root}/{hash[0:2]}/{hash[2:4]}/{hash}, with their resized
+variants next to them as {hash}.web.jpg / {hash}.thumb.jpg. A path never
+changes content once written, so identical uploads share one file.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+# Longest edge in pixels for each generated variant
+VARIANT_SIZES = {
+    "web": 1600,
+    "thumbnail": 320,
+}
+VARIANT_SUFFIXES = {
+    "web": "web.jpg",
+    "thumbnail": "thumb.jpg",
+}
+JPEG_QUALITY = 82
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# EXIF orientations that rotate the image by 90/270 degrees
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# What Pillow raises for an upload it can't or won't decode: unknown formats
+# (UnidentifiedImageError is an OSError), truncated data, oversized images,
+# broken headers (SyntaxError in some plugins) and bad EXIF (ValueError)
+IMAGE_ERRORS = (Image.DecompressionBombError, OSError, SyntaxError, ValueError)
+
+# Formats whose originals are served under their own media type. Whatever else
+# Pillow reads is served as application/octet-stream, so an upload never gets a
+# type a browser would render as a document (text/html, image/svg+xml)
+SERVED_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+FALLBACK_MIME_TYPE = "application/octet-stream"
+
+class ImageDecodeError(Exception):
+    """The original could not be read as an image: the upload's fault, not the server's"""
+
+def blob_path(root: str, digest: str, variant: str = None) -> str:
+    """Sharded location of a blob (or one of its variants) in the store"""
+    name = digest if variant is None else f"{digest}.{VARIANT_SUFFIXES[variant]}"
+    return os.path.join(root, digest[0:2], digest[2:4], name)
+
+def variant_paths_for(root: str, digest: str) -> dict:
+    return {name: blob_path(root, digest, name) for name in VARIANT_SIZES}
+
+def store_upload(source, root: str) -> dict:
+    """Copy a file object into the blob store in chunks, hashing as it goes.
+
+    The data lands in a temp file under ``root`` and is renamed into place, so
+    a blob path is either absent or complete. If the blob already exists the
+    copy is discarded. Returns ``{"content_hash", "path", "size", "created"}``.
+    """
+    os.makedirs(root, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, partial = tempfile.mkstemp(dir=root, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+            size = out.tell()
+            out.flush()
+            os.fsync(out.fileno())
+
+        content_hash = digest.hexdigest()
+        path = blob_path(root, content_hash)
+        created = not os.path.exists(path)
+        if created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(partial, path)
+        return {"content_hash": content_hash, "path": path, "size": size, "created": created}
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_variants(original_path: str, variant_paths: dict) -> dict:
+    """Write resized JPEG variants of an image.
+
+    ``variant_paths`` maps a VARIANT_SIZES key to its output path. Returns the
+    original's display dimensions and the media type to serve it as. Raises ImageDecodeError for files Pillow
+    cannot read; errors writing the variants (disk full, permissions) propagate
+    as they are. Either way any variant it wrote is removed first. Variants
+    that already exist are kept as-is.
+    """
+    written = []
+    try:
+        return _make_variants(original_path, variant_paths, written)
+    except BaseException:
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+def _decode(original_path: str, largest: int):
+    """Open and fully decode an image, upright and in RGB.
+
+    Returns ``(image, width, height, mime_type)``, the type taken from the
+    format Pillow detected (see SERVED_MIME_TYPES). Pillow's errors become ImageDecodeError,
+    except OSErrors carrying an errno (EIO, EMFILE, ...): those are the disk
+    failing, not the upload, and propagate unchanged.
+    """
+    try:
+        with Image.open(original_path) as original:
+            mime_type = SERVED_MIME_TYPES.get(original.format, FALLBACK_MIME_TYPE)
+            width, height = original.size
+            if original.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+
+            # JPEG decoders can downscale while decoding; ask for just enough pixels
+            original.draft("RGB", (largest, largest))
+            original.load()
+            # Always a copy (Pillow >= 9.4), so it outlives the file
+            img = ImageOps.exif_transpose(original)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+    except IMAGE_ERRORS as e:
+        if isinstance(e, OSError) and e.errno is not None:
+            raise
+        raise ImageDecodeError(f"{type(e).__name__}: {e}") from e
+    return img, width, height, mime_type
+
+def _make_variants(original_path: str, variant_paths: dict, written: list) -> dict:
+    largest = max(VARIANT_SIZES[name] for name in variant_paths)
+    img, width, height, mime_type = _decode(original_path, largest)
+
+    for name in sorted(variant_paths, key=lambda n: VARIANT_SIZES[n], reverse=True):
+        size = VARIANT_SIZES[name]
+        img.thumbnail((size, size), Image.LANCZOS)
+        if os.path.exists(variant_paths[name]):
+            continue
+        partial = f"{variant_paths[name]}.{os.getpid()}.part"
+        written.append(partial)
+        img.save(partial, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(partial, variant_paths[name])
+        written.append(variant_paths[name])
+
+    return {"width": width, "height": height, "mime_type": mime_type}
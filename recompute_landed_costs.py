@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Buses America - Landed Cost Recompute
+Recomputes the cached inventory.total_cost_usd/total_cost_mxn (and so
+profit_usd/profit_mxn) from landed_cost_lines() for every unit, in batches of
+inventory IDs, rewriting only the units whose totals changed.
+
+The triggers keep the totals current as cost items, work plans and a unit's
+own cost columns change, but not when exchange rates do: run this after
+back-dating or correcting a rate, or after loading costs with triggers off.
+
+Usage:
+    DATABASE_URL=postgresql://... python recompute_landed_costs.py
+        [--dry-run] [--batch-size 5000] [--inventory-id 42 ...]
+
+Exits with status 2 when any unit's totals were out of date, so it can run
+from cron/CI.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import asyncpg
+
+# Units of this batch whose cached totals differ from their cost lines
+STALE_QUERY = """
+    SELECT i.inventory_id
+    FROM inventory i
+    WHERE i.inventory_id = ANY($1::int[])
+      AND NOT EXISTS (
+          SELECT 1 FROM landed_cost_totals(i) t
+          WHERE (t.total_cost_usd, t.total_cost_mxn) IS NOT DISTINCT FROM (i.total_cost_usd, i.total_cost_mxn)
+      )
+    ORDER BY i.inventory_id
+"""
+
+async def recompute(database_url, batch_size, inventory_ids, dry_run):
+    """Return the number of units checked and the IDs whose totals were stale"""
+    conn = await asyncpg.connect(database_url)
+    try:
+        if inventory_ids:
+            batches = [inventory_ids[i:i + batch_size] for i in range(0, len(inventory_ids), batch_size)]
+        else:
+            all_ids = [row["inventory_id"] for row in await conn.fetch(
+                "SELECT inventory_id FROM inventory ORDER BY inventory_id"
+            )]
+            batches = [all_ids[i:i + batch_size] for i in range(0, len(all_ids), batch_size)]
+
+        checked = 0
+        stale = []
+        for batch in batches:
+            # One transaction per batch keeps row locks short on a live fleet
+            async with conn.transaction():
+                stale.extend(row["inventory_id"] for row in await conn.fetch(STALE_QUERY, batch))
+                if not dry_run:
+                    await conn.fetchval("SELECT refresh_landed_costs($1::int[])", batch)
+            checked += len(batch)
+            print(f"   … {checked:,} units checked, {len(stale):,} stale")
+        return checked, stale
+    finally:
+        await conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute cached landed cost totals")
+    parser.add_argument("--dry-run", action="store_true", help="report stale units without writing")
+    parser.add_argument("--batch-size", type=int, default=5000, help="units per transaction")
+    parser.add_argument("--inventory-id", type=int, action="append", help="only this unit (repeatable)")
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    print("=" * 50)
+    print("Buses America - Landed Cost Recompute")
+    print("=" * 50)
+
+    start = time.perf_counter()
+    checked, stale = asyncio.run(recompute(database_url, args.batch_size, args.inventory_id, args.dry_run))
+    elapsed = time.perf_counter() - start
+
+    if not stale:
+        print(f"✓ {checked:,} unit(s) checked in {elapsed:.1f}s, all totals current")
+        return
+
+    shown = ", ".join(str(i) for i in stale[:20]) + (" …" if len(stale) > 20 else "")
+    print(f"✗ {len(stale):,} of {checked:,} unit(s) had stale totals: {shown}")
+    if args.dry_run:
+        print("\nDry run: totals left unchanged")
+    else:
+        print(f"\n✓ Totals rewritten in {elapsed:.1f}s")
+    sys.exit(2)
+
+if __name__ == "__main__":
+    main()
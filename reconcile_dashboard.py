@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Buses America - Dashboard Summary Reconcile
+Recomputes the dashboard_summary row from scratch over inventory, reports any
+drift against the trigger-maintained values and writes the fresh totals.
+
+Usage:
+    DATABASE_URL=postgresql://... python reconcile_dashboard.py [--dry-run]
+
+Exits with status 2 when drift was found, so it can run from cron/CI.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+import asyncpg
+
+SUMMARY_COLUMNS = [
+    "total_units",
+    "us_inventory",
+    "mexico_inventory",
+    "available_for_sale",
+    "sold_pending_delivery",
+    "delivered",
+    "under_warranty",
+    "us_inventory_value",
+    "open_units",
+    "open_purchase_day_sum",
+]
+
+RECOMPUTE_QUERY = """
+    SELECT
+        COUNT(*) as total_units,
+        COUNT(*) FILTER (WHERE current_location = 'US Stock') as us_inventory,
+        COUNT(*) FILTER (WHERE current_location = 'Mexico Stock') as mexico_inventory,
+        COUNT(*) FILTER (WHERE is_sold = FALSE) as available_for_sale,
+        COUNT(*) FILTER (WHERE is_sold = TRUE AND status != 'Delivered') as sold_pending_delivery,
+        COUNT(*) FILTER (WHERE status = 'Delivered') as delivered,
+        COUNT(*) FILTER (WHERE warranty_status = 'Active') as under_warranty,
+        COALESCE(SUM(cost_in_us_stock_usd) FILTER (WHERE current_location = 'US Stock'), 0) as us_inventory_value,
+        COUNT(*) FILTER (WHERE status != 'Delivered') as open_units,
+        COALESCE(SUM(purchase_date - DATE '1970-01-01') FILTER (WHERE status != 'Delivered'), 0) as open_purchase_day_sum
+    FROM inventory
+    WHERE is_deleted = FALSE
+"""
+
+async def reconcile(database_url, dry_run):
+    """Return the list of (column, stored, actual) that drifted"""
+    conn = await asyncpg.connect(database_url)
+    try:
+        async with conn.transaction():
+            # Locking the summary row waits for in-flight inventory writers and
+            # blocks new ones, so the recompute below sees a settled table.
+            stored = await conn.fetchrow(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM dashboard_summary WHERE summary_id = 1 FOR UPDATE"
+            )
+            actual = await conn.fetchrow(RECOMPUTE_QUERY)
+
+            if stored is None:
+                drift = [(column, None, actual[column]) for column in SUMMARY_COLUMNS]
+            else:
+                drift = [
+                    (column, stored[column], actual[column])
+                    for column in SUMMARY_COLUMNS
+                    if stored[column] != actual[column]
+                ]
+
+            if drift and not dry_run:
+                await conn.execute(
+                    f"""
+                    INSERT INTO dashboard_summary (summary_id, {', '.join(SUMMARY_COLUMNS)}, updated_at)
+                    VALUES (1, {', '.join(f'${i}' for i in range(1, len(SUMMARY_COLUMNS) + 1))}, CURRENT_TIMESTAMP)
+                    ON CONFLICT (summary_id) DO UPDATE SET
+                        {', '.join(f'{c} = EXCLUDED.{c}' for c in SUMMARY_COLUMNS)},
+                        updated_at = EXCLUDED.updated_at
+                    """,
+                    *[actual[column] for column in SUMMARY_COLUMNS]
+                )
+        return drift
+    finally:
+        await conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute dashboard_summary and report drift")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without writing")
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    print("=" * 50)
+    print("Buses America - Dashboard Reconcile")
+    print("=" * 50)
+
+    drift = asyncio.run(reconcile(database_url, args.dry_run))
+
+    if not drift:
+        print("✓ dashboard_summary matches inventory, no drift")
+        return
+
+    print(f"✗ Drift in {len(drift)} column(s):")
+    for column, stored, actual in drift:
+        print(f"  {column:<24} stored={stored}  actual={actual}")
+    if args.dry_run:
+        print("\nDry run: summary left unchanged")
+    else:
+        print("\n✓ dashboard_summary rewritten from scratch")
+    sys.exit(2)
+
+if __name__ == "__main__":
+    main()
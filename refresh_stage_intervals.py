@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Buses America - Stage Interval Refresh
+Rebuilds inventory_stage_intervals and inventory_stock_days for the units
+whose status history changed since the last run (queued in
+stage_intervals_pending by the history and inventory triggers).
+GET /api/inventory/{id}/stages, GET /api/reports/stage-durations and the
+days_in_us_stock / days_in_mexico_stock of every inventory response only read
+them, so run this every few minutes; a run with an empty queue does nothing.
+
+Usage:
+    DATABASE_URL=postgresql://... python refresh_stage_intervals.py
+"""
+
+import asyncio
+import os
+import sys
+
+import asyncpg
+
+async def refresh(database_url):
+    """Return the number of units whose intervals were rebuilt"""
+    conn = await asyncpg.connect(database_url)
+    try:
+        return await conn.fetchval("SELECT refresh_stage_intervals()")
+    finally:
+        await conn.close()
+
+def main():
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    rebuilt = asyncio.run(refresh(database_url))
+    print(f"✓ Stage intervals rebuilt for {rebuilt:,} unit(s)")
+
+if __name__ == "__main__":
+    main()
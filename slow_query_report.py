@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Buses America - Slow Query Report
+Summarizes the API's slow-query log (SLOW_QUERY_LOG_PATH plus its rotated
+backups): statements grouped by query text, ranked by total time spent.
+
+Usage:
+    python slow_query_report.py [--path ./logs/slow_queries.log] [--top 20]
+                                [--by query|route] [--since 2024-05-01] [--plans]
+
+Turn the log on without a restart:
+    curl -X PATCH localhost:8000/api/admin/slow-query-log \\
+         -H 'Content-Type: application/json' \\
+         -d '{"enabled": true, "threshold_ms": 100, "explain_sample_rate": 0.1}'
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+
+def log_files(path):
+    """The live log and its rotated backups, oldest first"""
+    backups = [p for p in glob.glob(f"{glob.escape(path)}.*") if p.rsplit(".", 1)[1].isdigit()]
+    backups.sort(key=lambda p: int(p.rsplit(".", 1)[1]), reverse=True)
+    return backups + ([path] if os.path.exists(path) else [])
+
+def read_entries(files, since):
+    skipped = 0
+    for name in files:
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if since and entry.get("ts", "") < since:
+                    continue
+                yield entry
+    if skipped:
+        print(f"  ({skipped} unreadable line(s) skipped)", file=sys.stderr)
+
+def percentile(sorted_values, fraction):
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarize(entries, by):
+    groups = {}
+    for entry in entries:
+        key = entry.get(by) or "(none)"
+        group = groups.setdefault(key, {"durations": [], "rows": 0, "routes": set(), "plan": None, "last": None})
+        group["durations"].append(entry["duration_ms"])
+        group["rows"] += entry.get("rows") or 0
+        if entry.get("route"):
+            group["routes"].add(f"{entry.get('method')} {entry['route']}")
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+        group["last"] = entry
+
+    summary = []
+    for key, group in groups.items():
+        durations = sorted(group["durations"])
+        summary.append({
+            "key": key,
+            "count": len(durations),
+            "total_ms": sum(durations),
+            "mean_ms": sum(durations) / len(durations),
+            "p95_ms": percentile(durations, 0.95),
+            "max_ms": durations[-1],
+            "mean_rows": group["rows"] / len(durations),
+            "routes": sorted(group["routes"]),
+            "params": group["last"].get("params", []),
+            "plan": group["plan"],
+        })
+    summary.sort(key=lambda s: s["total_ms"], reverse=True)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Top slow statements from the API slow-query log")
+    parser.add_argument("--path", default=os.getenv("SLOW_QUERY_LOG_PATH", "./logs/slow_queries.log"))
+    parser.add_argument("--top", type=int, default=20, help="number of offenders to show")
+    parser.add_argument("--by", choices=["query", "route"], default="query", help="grouping key")
+    parser.add_argument("--since", help="only entries at or after this ISO timestamp")
+    parser.add_argument("--plans", action="store_true", help="print the latest captured plan per statement")
+    args = parser.parse_args()
+
+    files = log_files(args.path)
+    if not files:
+        print(f"ERROR: no slow-query log at {args.path}")
+        sys.exit(1)
+
+    summary = summarize(read_entries(files, args.since), args.by)
+
+    print("=" * 50)
+    print("Buses America - Slow Query Report")
+    print("=" * 50)
+    total = sum(s["total_ms"] for s in summary)
+    print(f"{sum(s['count'] for s in summary)} slow statement(s), {total / 1000:.1f}s total, "
+          f"{len(summary)} distinct {args.by}(s), from {len(files)} file(s)\n")
+
+    print(f"{'#':>3} {'count':>6} {'total s':>9} {'share':>6} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'rows':>8}")
+    for rank, s in enumerate(summary[:args.top], 1):
+        share = s["total_ms"] / total * 100 if total else 0
+        print(f"{rank:>3} {s['count']:>6} {s['total_ms'] / 1000:>9.2f} {share:>5.1f}% "
+              f"{s['mean_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['max_ms']:>9.1f} {s['mean_rows']:>8.0f}")
+        key = s["key"] if len(s["key"]) <= 300 else s["key"][:300] + " …"
+        print(f"      {key}")
+        if args.by == "query":
+            print(f"      params: {', '.join(s['params']) or '-'}")
+            if s["routes"]:
+                print(f"      routes: {', '.join(s['routes'])}")
+        if args.plans:
+            if s["plan"]:
+                print("      plan:")
+                for line in s["plan"].splitlines():
+                    print(f"        {line}")
+            else:
+                print("      plan: (none captured)")
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Buses America - Daily Inventory Snapshot
+Records today's inventory (units, value and age by location, status and sold
+flag) in inventory_snapshots, the history behind GET /api/reports/trends.
+Run once a day; re-running on the same day replaces that day's snapshot.
+
+Usage:
+    DATABASE_URL=postgresql://... python snapshot_inventory.py [--retain-years 5]
+
+--retain-years drops the yearly partitions of snapshots older than that many
+years before the current one.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date
+
+import asyncpg
+
+PARTITIONS_QUERY = """
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'inventory_snapshots'::regclass
+    ORDER BY c.relname
+"""
+
+async def snapshot(database_url, retain_years):
+    """Return the number of snapshot rows written and the partitions dropped"""
+    conn = await asyncpg.connect(database_url)
+    try:
+        written = await conn.fetchval("SELECT take_inventory_snapshot()")
+
+        dropped = []
+        if retain_years is not None:
+            oldest_kept = date.today().year - retain_years
+            for row in await conn.fetch(PARTITIONS_QUERY):
+                # Named inventory_snapshots_<year> by take_inventory_snapshot()
+                year = row["relname"].rsplit("_", 1)[-1]
+                if year.isdigit() and int(year) < oldest_kept:
+                    await conn.execute(f'DROP TABLE "{row["relname"]}"')
+                    dropped.append(row["relname"])
+        return written, dropped
+    finally:
+        await conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Record today's inventory snapshot")
+    parser.add_argument("--retain-years", type=int, help="drop snapshots older than this many years")
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    print("=" * 50)
+    print("Buses America - Inventory Snapshot")
+    print("=" * 50)
+
+    written, dropped = asyncio.run(snapshot(database_url, args.retain_years))
+
+    print(f"✓ Snapshot for {date.today().isoformat()}: {written:,} row(s)")
+    for name in dropped:
+        print(f"✓ Dropped {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Buses America - Database Upgrade
+Brings an existing database up to bus_inventory_schema_FINAL.sql without
+losing data. It covers every schema change since the original schema (indexes,
+summary tables and their triggers, stage intervals, landed cost totals, photo
+blob columns), not one feature in particular. init_database.py runs it whenever the tables already exist, and
+render.yaml runs init_database.py before gunicorn starts, so a deploy never
+serves requests against an older schema.
+
+The schema file stays the single source of truth. Its statements are replayed
+idempotently, in file order, inside one transaction:
+  - CREATE TABLE / CREATE INDEX become IF NOT EXISTS, and columns the schema
+    declares but an existing table lacks are added (generated columns such as
+    search_vector are computed for every row as they are added)
+  - functions are CREATE OR REPLACE'd; triggers and views are dropped and
+    recreated, so row-level triggers that became statement-level switch over
+  - INSERTs only run for tables created by this upgrade (the singleton summary
+    rows); the sample data is never re-inserted
+Indexes the schema redefined or dropped, and functions it removed, are listed
+below and dropped first.
+
+Backfills for objects created by this run, in the same transaction:
+  - dashboard_summary is recomputed from inventory
+  - every unit is queued for refresh_stage_intervals(), which then builds
+    inventory_stage_intervals and inventory_stock_days
+After the commit, if the landed cost functions are new, every unit's cached
+totals are recomputed in batches (recompute_landed_costs.py; run that by hand
+if this step is interrupted, since the next upgrade won't repeat it).
+
+The replay takes ACCESS EXCLUSIVE locks on the tables whose triggers it
+recreates and on every view, which would stall an instance still serving
+during a rolling deploy. So the hash of the schema statements is recorded in
+schema_version, and a start against a database already at that hash returns
+before taking any lock. init_database.py records it after a fresh load too.
+
+Order when upgrading a database from before these changes:
+  1. python upgrade_database.py (or init_database.py; runs on every start)
+  2. python migrate_photo_blobs.py, with UPLOAD_DIR pointing at the photo
+     files, to move photos uploaded before content-addressed storage
+  3. python snapshot_inventory.py, to start the trend series
+Re-running is safe: a database that is already current is left untouched.
+
+Usage:
+    DATABASE_URL=postgresql://... python upgrade_database.py [--schema-file bus_inventory_schema_FINAL.sql]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+
+import asyncpg
+
+from reconcile_dashboard import RECOMPUTE_QUERY, SUMMARY_COLUMNS
+from recompute_landed_costs import recompute
+
+# Indexes whose definition changed under the same name: dropped when still in
+# the old form so CREATE INDEX IF NOT EXISTS builds the new one
+REDEFINED_INDEXES = {
+    "idx_inventory_vin": "text_pattern_ops",
+    "idx_inventory_stock_number": "text_pattern_ops",
+    "idx_pre_inspection_vin": "text_pattern_ops",
+}
+
+# Objects older schemas created that the current one no longer has
+DROP_SQL = """
+DROP INDEX IF EXISTS idx_inventory_status;
+DROP INDEX IF EXISTS idx_inventory_is_sold;
+DROP INDEX IF EXISTS idx_inventory_current_location;
+DROP INDEX IF EXISTS idx_inventory_warranty_status;
+DROP FUNCTION IF EXISTS stock_days(INTEGER, TEXT);
+DROP FUNCTION IF EXISTS stock_days(inventory);
+DROP FUNCTION IF EXISTS refresh_stock_days(INTEGER[]);
+"""
+
+SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    schema_hash TEXT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def strip_comments(sql):
+    """Remove -- comments outside string literals and dollar-quoted bodies"""
+    out = []
+    i = 0
+    while i < len(sql):
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+        elif sql[i] == "'":
+            end = sql.find("'", i + 1)
+            out.append(sql[i:end + 1])
+            i = end + 1
+        elif sql[i] == "$" and (tag := re.match(r"\$\w*\$", sql[i:])):
+            end = sql.find(tag.group(), i + len(tag.group())) + len(tag.group())
+            out.append(sql[i:end])
+            i = end
+        else:
+            out.append(sql[i])
+            i += 1
+    return "".join(out)
+
+def scan(sql):
+    """Yield (index, char, depth) for SQL outside quotes and dollar-quoted bodies"""
+    depth = 0
+    i = 0
+    while i < len(sql):
+        c = sql[i]
+        if c == "'":
+            i = sql.find("'", i + 1) + 1
+            continue
+        if c == "$" and (tag := re.match(r"\$\w*\$", sql[i:])):
+            i = sql.find(tag.group(), i + len(tag.group())) + len(tag.group())
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        yield i, c, depth
+        i += 1
+
+def split_top_level(sql, separator):
+    """Split on ``separator`` where it is outside quotes and parentheses"""
+    parts = []
+    start = 0
+    for i, c, depth in scan(sql):
+        if c == separator and depth == 0:
+            parts.append(sql[start:i])
+            start = i + 1
+    parts.append(sql[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+def table_columns(create_table):
+    """(name, definition) of each column in a CREATE TABLE statement"""
+    opening = create_table.index("(")
+    closing = next(i for i, c, depth in scan(create_table) if c == ")" and depth == 0)
+    columns = []
+    for item in split_top_level(create_table[opening + 1:closing], ","):
+        name = item.split()[0]
+        if name.upper() not in ("PRIMARY", "UNIQUE", "CHECK", "FOREIGN", "CONSTRAINT", "EXCLUDE"):
+            columns.append((name, item))
+    return columns
+
+def schema_statements(schema_sql):
+    return split_top_level(strip_comments(schema_sql), ";")
+
+def schema_hash(statements):
+    """Fingerprint of the schema statements; comment and whitespace edits don't change it"""
+    normalized = "\n".join(" ".join(statement.split()) for statement in statements)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+async def applied_schema_hash(conn):
+    """Hash recorded by the last upgrade or fresh load, or None"""
+    if not await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL"):
+        return None
+    return await conn.fetchval("SELECT schema_hash FROM schema_version ORDER BY applied_at DESC LIMIT 1")
+
+async def record_schema_hash(conn, statements):
+    await conn.execute(SCHEMA_VERSION_SQL)
+    await conn.execute("DELETE FROM schema_version")
+    await conn.execute("INSERT INTO schema_version (schema_hash) VALUES ($1)", schema_hash(statements))
+
+async def existing_columns(conn, table):
+    rows = await conn.fetch(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = $1", table
+    )
+    return {row["column_name"] for row in rows}
+
+async def upgrade_statements(conn, statement, created):
+    """Run one schema statement in its idempotent form"""
+    words = statement.split()
+    head = " ".join(words[:3]).upper()
+
+    if head.startswith("CREATE TABLE"):
+        table = words[2]
+        if not await existing_columns(conn, table):
+            await conn.execute(statement)
+            created.add(table)
+            return
+        have = await existing_columns(conn, table)
+        for name, definition in table_columns(statement):
+            if name not in have:
+                print(f"  + {table}.{name}")
+                await conn.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+    elif head.startswith("CREATE INDEX") or head.startswith("CREATE UNIQUE INDEX"):
+        await conn.execute(re.sub(r"\bINDEX\b", "INDEX IF NOT EXISTS", statement, count=1))
+    elif head.startswith("CREATE FUNCTION"):
+        await conn.execute("CREATE OR REPLACE " + statement[len("CREATE "):])
+    elif head.startswith("CREATE TRIGGER"):
+        table = re.search(r"\bON\s+(\w+)", statement).group(1)
+        await conn.execute(f"DROP TRIGGER IF EXISTS {words[2]} ON {table}")
+        await conn.execute(statement)
+    elif head.startswith("CREATE VIEW"):
+        await conn.execute(f"DROP VIEW IF EXISTS {words[2]}")
+        await conn.execute(statement)
+    elif head.startswith("INSERT INTO"):
+        if words[2] in created:
+            await conn.execute(statement)
+    else:
+        # CREATE OR REPLACE FUNCTION, CREATE EXTENSION IF NOT EXISTS
+        await conn.execute(statement)
+
+async def upgrade(database_url, schema_file):
+    """Apply the schema to an existing database; returns the tables created"""
+    with open(schema_file, 'r') as f:
+        statements = schema_statements(f.read())
+    target = schema_hash(statements)
+
+    conn = await asyncpg.connect(database_url)
+    try:
+        if await applied_schema_hash(conn) == target:
+            print("  ✓ schema unchanged, nothing to replay")
+            return set()
+
+        landed_costs_new = await conn.fetchval(
+            "SELECT to_regprocedure('landed_cost_totals(inventory)') IS NULL"
+        )
+        created = set()
+        async with conn.transaction():
+            # One upgrade at a time when several instances start together
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('upgrade_database'))")
+            if await applied_schema_hash(conn) == target:
+                # Another instance upgraded while this one waited for the lock
+                return set()
+
+            for index, marker in REDEFINED_INDEXES.items():
+                definition = await conn.fetchval(
+                    "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND indexname = $1",
+                    index
+                )
+                if definition and marker not in definition:
+                    await conn.execute(f"DROP INDEX {index}")
+            await conn.execute(DROP_SQL)
+
+            for statement in statements:
+                await upgrade_statements(conn, statement, created)
+
+            if "dashboard_summary" in created:
+                columns = ", ".join(SUMMARY_COLUMNS)
+                await conn.execute(
+                    f"UPDATE dashboard_summary SET ({columns}) = "
+                    f"(SELECT {columns} FROM ({RECOMPUTE_QUERY}) actual) WHERE summary_id = 1"
+                )
+                print("  ✓ dashboard summary computed")
+
+            if created & {"inventory_stage_intervals", "inventory_stock_days"}:
+                await conn.execute(
+                    "INSERT INTO stage_intervals_pending SELECT inventory_id FROM inventory "
+                    "ON CONFLICT DO NOTHING"
+                )
+            rebuilt = await conn.fetchval("SELECT refresh_stage_intervals()")
+            if rebuilt:
+                print(f"  ✓ stage intervals of {rebuilt:,} unit(s)")
+
+            await record_schema_hash(conn, statements)
+
+        for table in sorted(created):
+            print(f"  + {table}")
+    finally:
+        await conn.close()
+
+    if landed_costs_new:
+        # Batched, one transaction each, so a large fleet isn't locked at once
+        checked, stale = await recompute(database_url, 5000, None, dry_run=False)
+        print(f"  ✓ landed cost totals of {checked:,} unit(s) checked, {len(stale):,} rewritten")
+
+    return created
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade an existing database to the current schema")
+    parser.add_argument("--schema-file", default="bus_inventory_schema_FINAL.sql")
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
+
+    print("=" * 50)
+    print("Buses America - Database Upgrade")
+    print("=" * 50)
+
+    asyncio.run(upgrade(database_url, args.schema_file))
+    print("✓ Database schema is current")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Buses America - Offline VIN Decoder
+Decodes the parts of a 17-character VIN that need no outside lookup: the
+manufacturer from its WMI (first three characters), the model year from the
+10th character where it is unambiguous, and the check digit (9th). Enough to
+pre-fill make (and usually not year) on a new inspection without calling a VIN
+service; keep this module free of FastAPI/asyncpg imports so the seed
+generator can share its tables.
+"""
+
+import re
+from datetime import date
+from functools import lru_cache
+from typing import List, Optional
+
+# Letters I, O and Q are never used, so they can't be confused with 1 and 0
+VIN_PATTERN = re.compile(r"[A-HJ-NPR-Z0-9]{17}")
+VIN_CHARACTERS = re.compile(r"[A-HJ-NPR-Z0-9]+")
+
+# Check digit transliteration and position weights (49 CFR 565)
+VIN_VALUES = {
+    **{str(d): d for d in range(10)},
+    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7, 'H': 8,
+    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'P': 7, 'R': 9,
+    'S': 2, 'T': 3, 'U': 4, 'V': 5, 'W': 6, 'X': 7, 'Y': 8, 'Z': 9,
+}
+VIN_WEIGHTS = [8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2]
+# Model year codes repeat every 30 years; index 0 is 1980 (and 2010). The 7th
+# character only tells the cycles apart on vehicles of 10,000 lb GVWR or less
+# (49 CFR 565.15); buses are heavier, so a code whose 1980s-2000s and 2010s-30s
+# years are both possible is ambiguous
+VIN_YEAR_CODES = 'ABCDEFGHJKLMNPRSTVWXY123456789'
+
+# World manufacturer identifiers of the bus builders and chassis makers we buy
+# from: WMI -> (manufacturer, make as we record it, or None when the chassis
+# maker builds for several bus brands)
+WMI_MANUFACTURERS = {
+    '1BA': ('Blue Bird Body Company', 'Blue Bird'),
+    '1T7': ('Thomas Built Buses', 'Thomas Built'),
+    '1T8': ('Thomas Built Buses', 'Thomas Built'),
+    '4UZ': ('Freightliner Custom Chassis', None),  # Thomas Built and Freightliner buses
+    '4DR': ('IC Bus', 'IC Bus'),
+    '1HV': ('Navistar International', 'International'),
+    '1HT': ('Navistar International', 'International'),
+    '1FV': ('Freightliner', 'Freightliner'),
+    '3AK': ('Freightliner Mexico', 'Freightliner'),
+    '15G': ('Gillig', 'Gillig'),
+    '1M8': ('Motor Coach Industries', 'MCI'),
+    '2FY': ('New Flyer', 'New Flyer'),
+    '5FY': ('New Flyer of America', 'New Flyer'),
+    '1FB': ('Ford', 'Ford'),
+    '1FD': ('Ford', 'Ford'),
+    '1FT': ('Ford', 'Ford'),
+    '1GB': ('Chevrolet', 'Chevrolet'),
+    '1GD': ('GMC', 'GMC'),
+}
+
+# First VIN character -> country of manufacture
+VIN_COUNTRIES = {
+    '1': 'United States', '4': 'United States', '5': 'United States',
+    '2': 'Canada', '3': 'Mexico',
+}
+
+def check_digit(vin: str) -> str:
+    """The check digit (9th character) a VIN must carry"""
+    remainder = sum(VIN_VALUES[c] * w for c, w in zip(vin, VIN_WEIGHTS)) % 11
+    return 'X' if remainder == 10 else str(remainder)
+
+def model_year_candidates(code: str, latest: int) -> List[int]:
+    """Every model year a 10th-character code can mean, up to ``latest``, oldest first"""
+    index = VIN_YEAR_CODES.find(code)
+    if index < 0:
+        return []
+    return [year for year in range(1980 + index, latest + 1, 30)]
+
+def model_year(code: str, latest: int) -> Optional[int]:
+    """Model year of a 10th-character code; None when it is unknown or when
+    more than one 30-year cycle fits (the code alone can't tell them apart)"""
+    candidates = model_year_candidates(code, latest)
+    return candidates[0] if len(candidates) == 1 else None
+
+def decode_vin(vin: str, latest_year: Optional[int] = None) -> dict:
+    """Decode a 17-character VIN; raises ValueError if it isn't one.
+
+    ``latest_year`` (default: next year) is the newest model year accepted.
+    model_year is set only when one year fits; model_year_candidates lists
+    them all. Unknown WMIs decode with manufacturer/make None.
+    """
+    vin = vin.strip().upper()
+    if not VIN_PATTERN.fullmatch(vin):
+        raise ValueError("A VIN is 17 letters and digits, without I, O or Q")
+    return dict(_decode(vin, latest_year or date.today().year + 1))
+
+# The same VINs come back all day (lookups, inspections of units we already own)
+@lru_cache(maxsize=4096)
+def _decode(vin: str, latest_year: int) -> tuple:
+    manufacturer, make = WMI_MANUFACTURERS.get(vin[:3], (None, None))
+    return (
+        ("vin", vin),
+        ("wmi", vin[:3]),
+        ("manufacturer", manufacturer),
+        ("make", make),
+        ("country", VIN_COUNTRIES.get(vin[0])),
+        ("model_year", model_year(vin[9], latest_year)),
+        ("model_year_candidates", tuple(model_year_candidates(vin[9], latest_year))),
+        ("plant_code", vin[10]),
+        ("serial_number", vin[11:]),
+        ("check_digit_valid", vin[8] == check_digit(vin)),
+    )